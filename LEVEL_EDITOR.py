@@ -3,6 +3,9 @@ import random
 
 from settings import *
 from tiles import *
+import resources
+import assets
+import text
 
 class Wall(pygame.sprite.Sprite):
     # Initialize the wall class
@@ -20,6 +23,14 @@ class Wall(pygame.sprite.Sprite):
         self.rect.y = y
 
 
+# The resources font of each text size
+font_names = {
+    "small": "smallfont",
+    "medium": "medfont",
+    "large": "largefont",
+    "huge": "hugefont",
+}
+
 class Editor:
     # Initialize the editor
     def __init__(self):
@@ -41,23 +52,23 @@ class Editor:
         self.game_display = pygame.display.set_mode((self.display_width, self.display_height + 100))
         pygame.display.set_caption("LEVEL EDITOR v3")
 
+        # Now that there is a display, convert all images to its pixel format
+        assets.prepare()
+
+        # Load the tilesets and fonts the editor needs
+        resources.load_group("editor")
+        load_tilesets()
+
         # Framerate
         self.clock = clock = pygame.time.Clock()
         self.FPS = 60
 
         self.running = True
 
-    # Make text object
+    # Make text object, the text comes from the text cache
     def text_object(self, msg, color, size):
-
-        if size == "small":
-            self.text_surface = smallfont.render(msg, False, color)
-        elif size == "medium":
-            self.text_surface = medfont.render(msg, False, color)
-        elif size == "large":
-            self.text_surface = largefont.render(msg, False, color)
-        elif size == "huge":
-            self.text_surface = hugefont.render(msg, False, color)
+        font_file, font_size = resources.fonts[font_names[size]]
+        self.text_surface = text.render(msg, color, font_size, font_file)
 
         return self.text_surface, self.text_surface.get_rect()
 
@@ -101,6 +112,9 @@ class Editor:
         self.details = pygame.sprite.Group()
         self.current_layer = "walls"
 
+        # The rects of the display that changed since the last frame, only those are drawn
+        self.dirty_rects = [self.game_display.get_rect()]
+
         self.run()
 
     # Game loop
@@ -108,10 +122,25 @@ class Editor:
         self.playing = True
         while self.playing:
             self.clock.tick(self.FPS)
+
+            # If nothing changed and no mouse button is held, sleep until there is an event
+            if not self.dirty_rects and not any(self.click):
+                pygame.event.post(pygame.event.wait())
+
             self.events()
             self.update()
             self.draw()
 
+    # Mark a rect of the display as changed, None marks the whole display
+    def mark_dirty(self, rect=None):
+        if rect is None:
+            rect = self.game_display.get_rect()
+        self.dirty_rects.append(pygame.Rect(rect))
+
+    # Mark the info panel below the level as changed
+    def mark_panel_dirty(self):
+        self.mark_dirty((0, self.display_height, self.display_width, 100))
+
     # Game loop - Events
     def events(self):
         # --- KEYBOARD AND QUIT EVENTS ---
@@ -121,10 +150,18 @@ class Editor:
                     self.playing = False
                 self.running = False
 
+            # The window has to be drawn again when it's uncovered
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.mark_dirty()
+
             if event.type == pygame.KEYDOWN:
+                # Tile, layer and tileset switching change the info panel
+                self.mark_panel_dirty()
+
                 # Clear the map if escape is pressed
                 if event.key == pygame.K_ESCAPE:
                     self.walls.empty()
+                    self.mark_dirty()
 
                 # Tile switching
                 if event.key == pygame.K_UP:
@@ -247,6 +284,7 @@ class Editor:
                         elif self.current_layer == "background_details":
                             self.background_details.add(w)
 
+                        self.mark_dirty(w.rect)
                         break
 
         # Tile erasing
@@ -270,13 +308,19 @@ class Editor:
                                     self.background_details.remove(w)
                                     break
 
+                        self.mark_dirty((x[0], x[1], 32, 32))
+
     # Game loop - Update
     def update(self):
         self.mouse_x, self.mouse_y = pygame.mouse.get_pos()
         self.click = pygame.mouse.get_pressed()
 
     # Game loop - Rendering/Drawing
+    # Nothing is drawn if nothing changed, and only the changed rects of the display are updated
     def draw(self):
+        if not self.dirty_rects:
+            return
+
         self.game_display.fill(black)
         self.level_surface.fill(white)
 
@@ -291,7 +335,8 @@ class Editor:
 
         self.game_display.blit(self.current_tileset.all_tiles[self.current_tile]["image"], (10, self.display_height + 10))
 
-        pygame.display.update()
+        pygame.display.update(self.dirty_rects)
+        self.dirty_rects = []
 
 # Creating the game window
 e = Editor()
@@ -0,0 +1,383 @@
+import math
+
+import numpy
+
+import settings
+import animation
+
+# The kinds of animals
+BIRD = 0
+BUTTERFLY = 1
+
+# The colors birds and butterflies can have
+bird_colors = ["blue", "red", "yellow"]
+butterfly_colors = ["red", "blue", "green"]
+
+# Animal system class
+# Keeps every bird and butterfly in NumPy arrays and updates them all in vectorised steps (like the
+# particle systems), so a level can have thousands of them
+# Birds walk randomly and fall onto the solid tiles of the tile grid, butterflies flutter randomly
+# around where they started. Hit animals move faster until they die
+# The animals have their own random number generator, it is seeded from the game's when they are cleared
+class AnimalSystem:
+    # The per-animal arrays and their types
+    fields = (("kind", numpy.int8), ("color", numpy.int8),
+              ("x", numpy.int32), ("y", numpy.int32), ("previous_x", numpy.int32), ("previous_y", numpy.int32),
+              ("width", numpy.int32), ("height", numpy.int32),
+              ("x_velocity", numpy.int32), ("y_velocity", numpy.float32),
+              ("start_x", numpy.int32), ("start_y", numpy.int32),
+              ("left", bool), ("hit", bool), ("dead", bool),
+              ("animation_index", numpy.int8), ("animation_counter", numpy.int8), ("frame", numpy.int8))
+
+    # Up to this many birds or butterflies are updated one by one, for a few animals that is quicker
+    # than the array steps (they give the same result)
+    scalar_count = 16
+
+    # Initialize the animal system class, grid is the collision.TileGrid birds land on
+    def __init__(self, grid, seed=None, capacity=64):
+        self.grid = grid
+        self.random = numpy.random.default_rng(seed)
+
+        self.y_top_speed = 30
+
+        self.count = 0
+        self.allocate(capacity)
+
+        # The images of every kind and color, they're looked up when the first animal is added
+        self.images = None
+
+    # Allocate the animal arrays, keeping the animals that are alive
+    def allocate(self, capacity):
+        for name, dtype in self.fields:
+            array = numpy.zeros(capacity, dtype)
+            if self.count:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+
+        self.capacity = capacity
+
+    # Look up the images of every kind and color in the animation tables
+    # Birds have a right and a left facing image per color, butterflies have their animation frames,
+    # image_base has the index of the first image of every (kind, color) in images
+    def load_images(self):
+        self.images = []
+        self.image_base = numpy.zeros((2, max(len(bird_colors), len(butterfly_colors))), numpy.int32)
+        self.frame_time = numpy.zeros(len(butterfly_colors), numpy.int8)
+        self.frame_count = numpy.zeros(len(butterfly_colors), numpy.int8)
+
+        for color, name in enumerate(bird_colors):
+            self.image_base[BIRD, color] = len(self.images)
+            self.images += [animation.bird[name, "right"][0], animation.bird[name, "left"][0]]
+
+        for color, name in enumerate(butterfly_colors):
+            self.image_base[BUTTERFLY, color] = len(self.images)
+            self.images += animation.butterfly[name, "right"]
+            self.frame_time[color] = animation.butterfly.frame_time(name)
+            self.frame_count[color] = len(animation.butterfly[name, "right"])
+
+    # Remove every animal, and seed the random number generator of the animals
+    def clear(self, seed=None):
+        self.count = 0
+        self.random = numpy.random.default_rng(seed)
+
+    # Create an animal of a kind and color with its top left at (x, y)
+    def add(self, kind, color, x, y):
+        if self.images is None:
+            self.load_images()
+
+        if self.count == self.capacity:
+            self.allocate(self.capacity * 2)
+
+        width, height = self.images[self.image_base[kind, color]].get_size()
+
+        i = self.count
+        for name, dtype in self.fields:
+            getattr(self, name)[i] = 0
+
+        self.kind[i] = kind
+        self.color[i] = color
+        self.x[i] = self.previous_x[i] = self.start_x[i] = x
+        self.y[i] = self.previous_y[i] = self.start_y[i] = y
+        self.width[i] = width
+        self.height[i] = height
+
+        self.count += 1
+
+    # Create a bird with a random color
+    def add_bird(self, x, y):
+        self.add(BIRD, int(self.random.integers(len(bird_colors))), x, y)
+
+    # Create a butterfly with a random color
+    def add_butterfly(self, x, y):
+        self.add(BUTTERFLY, int(self.random.integers(len(butterfly_colors))), x, y)
+
+    # Remember where every animal is before an update, so drawing can interpolate between the two
+    def remember_positions(self):
+        self.previous_x[:self.count] = self.x[:self.count]
+        self.previous_y[:self.count] = self.y[:self.count]
+
+    # Update the animals, if active is given (a bool array) only those animals are updated
+    def update(self, active=None):
+        n = self.count
+        if n == 0:
+            return
+
+        if active is None:
+            active = numpy.ones(n, bool)
+
+        self.update_birds(numpy.nonzero(active & (self.kind[:n] == BIRD))[0])
+        self.update_butterflies(numpy.nonzero(active & (self.kind[:n] == BUTTERFLY))[0])
+
+    # Update the birds at the indexes b
+    def update_birds(self, b):
+        if len(b) == 0:
+            return
+        if len(b) <= self.scalar_count:
+            self.update_birds_scalar(b)
+            return
+
+        x = self.x[b]
+        y = self.y[b]
+        width = self.width[b]
+        height = self.height[b]
+        x_velocity = self.x_velocity[b]
+        y_velocity = self.y_velocity[b]
+
+        # Face the way the bird is moving
+        left = self.left[b]
+        left[x_velocity > 0] = False
+        left[x_velocity < 0] = True
+        self.left[b] = left
+
+        # X-Axis movement, a bird that walks into a wall is pushed back 10 pixels per tile it hit
+        # Birds only walk now and then, so only the ones that move are checked
+        moving = numpy.nonzero(x_velocity)[0]
+        if len(moving):
+            x[moving] += x_velocity[moving]
+            hits, top = self.grid.overlap_solid(x[moving], y[moving], width[moving], height[moving])
+            x[moving] -= numpy.where(x_velocity[moving] > 0, 10, -10) * hits
+
+        # Y-Axis movement (rects round their position like pygame rects), a falling bird lands on the tiles it hit
+        y_velocity += numpy.where(y_velocity < self.y_top_speed, settings.player_grav, 0).astype(numpy.float32)
+        y = numpy.floor(y + y_velocity + 0.5).astype(numpy.int32)
+        hits, top = self.grid.overlap_solid(x, y, width, height)
+        landed = (hits > 0) & (y_velocity > 0)
+        y[landed] = top[landed] - height[landed]
+        y_velocity[landed] = settings.player_grav
+
+        # Move randomly, hit birds move faster and eventually die
+        # The random numbers of a step are drawn at once, a 1 in k chance is a draw below 1 / k
+        hit = self.hit[b]
+        chance = self.random.random((3, len(b)))
+        move = chance[0] < numpy.where(hit, 1 / 6, 1 / 61)
+        speed = numpy.where(hit, 20, 10)
+        x_velocity = numpy.where(move, numpy.where(chance[1] < 0.5, speed, -speed), 0)
+
+        dead = self.dead[b]
+        dead |= hit & (chance[2] < 1 / 121)
+
+        # Die if off screen
+        dead |= y > settings.display_height
+
+        self.x[b] = x
+        self.y[b] = y
+        self.x_velocity[b] = x_velocity
+        self.y_velocity[b] = y_velocity
+        self.dead[b] = dead
+
+    # update_birds one bird at a time
+    def update_birds_scalar(self, b):
+        grid = self.grid
+        gravity = settings.player_grav
+        chance = self.random.random((3, len(b))).tolist()
+
+        for j, i in enumerate(b.tolist()):
+            x = int(self.x[i])
+            y = int(self.y[i])
+            width = int(self.width[i])
+            height = int(self.height[i])
+            x_velocity = int(self.x_velocity[i])
+            y_velocity = float(self.y_velocity[i])
+
+            if x_velocity:
+                self.left[i] = x_velocity < 0
+                x += x_velocity
+                hits, top = grid.overlap_solid_rect(x, y, width, height)
+                x -= (10 if x_velocity > 0 else -10) * hits
+
+            if y_velocity < self.y_top_speed:
+                y_velocity += gravity
+            y = math.floor(y + y_velocity + 0.5)
+            hits, top = grid.overlap_solid_rect(x, y, width, height)
+            if hits and y_velocity > 0:
+                y = top - height
+                y_velocity = gravity
+
+            hit = self.hit[i]
+            x_velocity = 0
+            if chance[0][j] < (1 / 6 if hit else 1 / 61):
+                speed = 20 if hit else 10
+                x_velocity = speed if chance[1][j] < 0.5 else -speed
+
+            if (hit and chance[2][j] < 1 / 121) or y > settings.display_height:
+                self.dead[i] = True
+
+            self.x[i] = x
+            self.y[i] = y
+            self.x_velocity[i] = x_velocity
+            self.y_velocity[i] = y_velocity
+
+    # Update the butterflies at the indexes b
+    def update_butterflies(self, b):
+        if len(b) == 0:
+            return
+        if len(b) <= self.scalar_count:
+            self.update_butterflies_scalar(b)
+            return
+
+        color = self.color[b]
+        n = len(b)
+
+        # Flying animation
+        frame_time = self.frame_time[color]
+        counter = (self.animation_counter[b] + 1) % frame_time
+        next_frame = counter == frame_time - 1
+        index = self.animation_index[b]
+        index[next_frame] = (index[next_frame] + 1) % self.frame_count[color][next_frame]
+        frame = self.frame[b]
+        frame[next_frame] = (index[next_frame] - 1) % self.frame_count[color][next_frame]
+        self.animation_counter[b] = counter
+        self.animation_index[b] = index
+        self.frame[b] = frame
+
+        # Moving randomly, hit butterflies move further and eventually die
+        # The random numbers of a step are drawn at once (see update_birds)
+        hit = self.hit[b]
+        chance = self.random.random((5, n))
+        move_chance = numpy.where(hit, 1 / 3, 1 / 4)
+        distance = numpy.where(hit, 20, 10)
+
+        # A move is a whole number of pixels from -distance to distance
+        steps = (chance[2:4] * (2 * distance + 1)).astype(numpy.int32) - distance
+        x = self.x[b] + numpy.where(chance[0] < move_chance, steps[0], 0)
+        y = self.y[b] + numpy.where(chance[1] < move_chance, steps[1], 0)
+
+        self.dead[b] |= hit & (chance[4] < 1 / 121)
+
+        # Keep the butterfly within a 100px square of its original starting position
+        start_x = self.start_x[b]
+        start_y = self.start_y[b]
+        x[x < start_x - 50] += 20
+        x[x > start_x + 50] -= 20
+        y[y < start_y - 50] += 20
+        y[y > start_y + 50] -= 20
+
+        self.x[b] = x
+        self.y[b] = y
+
+    # update_butterflies one butterfly at a time
+    def update_butterflies_scalar(self, b):
+        chance = self.random.random((5, len(b))).tolist()
+
+        for j, i in enumerate(b.tolist()):
+            color = self.color[i]
+
+            # Flying animation
+            frame_time = int(self.frame_time[color])
+            frame_count = int(self.frame_count[color])
+            counter = (int(self.animation_counter[i]) + 1) % frame_time
+            if counter == frame_time - 1:
+                index = (int(self.animation_index[i]) + 1) % frame_count
+                self.animation_index[i] = index
+                self.frame[i] = (index - 1) % frame_count
+            self.animation_counter[i] = counter
+
+            # Moving randomly
+            hit = self.hit[i]
+            move_chance = 1 / 3 if hit else 1 / 4
+            distance = 20 if hit else 10
+
+            x = int(self.x[i])
+            y = int(self.y[i])
+            if chance[0][j] < move_chance:
+                x += int(chance[2][j] * (2 * distance + 1)) - distance
+            if chance[1][j] < move_chance:
+                y += int(chance[3][j] * (2 * distance + 1)) - distance
+
+            if hit and chance[4][j] < 1 / 121:
+                self.dead[i] = True
+
+            # Keep the butterfly within a 100px square of its original starting position
+            start_x = int(self.start_x[i])
+            start_y = int(self.start_y[i])
+            if x < start_x - 50:
+                x += 20
+            elif x > start_x + 50:
+                x -= 20
+            if y < start_y - 50:
+                y += 20
+            elif y > start_y + 50:
+                y -= 20
+
+            self.x[i] = x
+            self.y[i] = y
+
+    # Get which animals overlap a rect (a bool array)
+    def colliding(self, rect):
+        n = self.count
+        return ((self.x[:n] < rect.right) & (self.x[:n] + self.width[:n] > rect.left) &
+                (self.y[:n] < rect.bottom) & (self.y[:n] + self.height[:n] > rect.top))
+
+    # Hit every animal that overlaps a rect, returns True if any animal was hit
+    def hit_rect(self, rect):
+        if rect.width <= 0 or rect.height <= 0:
+            return False
+
+        colliding = self.colliding(rect)
+        self.hit[:self.count] |= colliding
+        return bool(colliding.any())
+
+    # Get the center x and bottom of every animal that is hit, as lists
+    def hit_positions(self):
+        if not numpy.count_nonzero(self.hit[:self.count]):
+            return [], []
+
+        hit = numpy.nonzero(self.hit[:self.count])[0]
+        return ((self.x[hit] + self.width[hit] // 2).tolist(), (self.y[hit] + self.height[hit]).tolist())
+
+    # Remove the dead animals by moving the living ones to the front of the arrays
+    def remove_dead(self):
+        n = self.count
+        dead = self.dead[:n]
+        if numpy.count_nonzero(dead):
+            alive = ~dead
+            self.count = int(alive.sum())
+            for name, dtype in self.fields:
+                array = getattr(self, name)
+                array[:self.count] = array[:n][alive]
+
+    # Draw the animals that overlap view_rect, offset moves the animals from world space to the target
+    # If alpha is less than 1, the animals are drawn interpolated between where they were before the
+    # last update and where they are now. Returns how many animals were drawn and culled
+    def draw(self, surface, view_rect, offset=(0, 0), alpha=1):
+        n = self.count
+        if n == 0:
+            return 0, 0
+
+        x = self.x[:n]
+        y = self.y[:n]
+        if alpha < 1:
+            x = x + ((self.previous_x[:n] - x) * (1 - alpha)).astype(numpy.int32)
+            y = y + ((self.previous_y[:n] - y) * (1 - alpha)).astype(numpy.int32)
+
+        visible = numpy.nonzero((x + self.width[:n] > view_rect.left) & (x < view_rect.right) &
+                                (y + self.height[:n] > view_rect.top) & (y < view_rect.bottom))[0]
+
+        kind = self.kind[visible]
+        image = self.image_base[kind, self.color[visible]] + numpy.where(kind == BIRD, self.left[visible], self.frame[visible])
+
+        images = self.images
+        surface.blits([(images[i], (left + offset[0], top + offset[1]))
+                       for i, left, top in zip(image.tolist(), x[visible].tolist(), y[visible].tolist())], False)
+
+        return len(visible), n - len(visible)
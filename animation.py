@@ -0,0 +1,80 @@
+import pygame
+
+import resources
+
+# Animation class
+# A sequence of frames (names of images that face right) and how many updates each frame is shown
+# Frames are mirrored to face left, unless left maps them to an image of their own
+class Animation:
+    # Initialize the animation class
+    def __init__(self, frames, frame_time=1, left=None):
+        self.frames = frames
+        self.frame_time = frame_time
+        self.left = left or {}
+
+# Mirrored copies of images, by image name
+mirrored_images = {}
+
+# Get an image mirrored to face left, every image is only mirrored once
+def mirrored(name):
+    if name not in mirrored_images:
+        mirrored_images[name] = pygame.transform.flip(getattr(resources, name), True, False)
+    return mirrored_images[name]
+
+# Animation table class
+# Maps (state, direction) to the frames of the animation of that state facing that direction
+# The frames are looked up the first time they are used, which has to be after the display exists
+class AnimationTable:
+    # Initialize the animation table class, animations is a dict of state to animation
+    def __init__(self, animations):
+        self.animations = animations
+        self.frames = {}
+
+    # Get the list of frames of a (state, direction)
+    def __getitem__(self, key):
+        frames = self.frames.get(key)
+
+        if frames is None:
+            state, direction = key
+            animation = self.animations[state]
+            if direction == "left":
+                frames = [getattr(resources, animation.left[name]) if name in animation.left else mirrored(name)
+                          for name in animation.frames]
+            else:
+                frames = [getattr(resources, name) for name in animation.frames]
+            self.frames[key] = frames
+
+        return frames
+
+    # Get how many updates each frame of a state is shown
+    def frame_time(self, state):
+        return self.animations[state].frame_time
+
+# -- ANIMATION TABLES --
+
+player = AnimationTable({
+    "walk": Animation(["player_walk_1_right", "player_walk_2_right", "player_walk_3_right", "player_walk_4_right"], 9),
+    "jump": Animation(["player_jump_right"]),
+    "shoot": Animation(["player_shoot_right"]),
+    "roll": Animation(["player_roll_right_1", "player_roll_right_2", "player_roll_right_3",
+                       "player_roll_right_4", "player_roll_right_2", "player_roll_right_1"], 5,
+                      # The first roll frame isn't drawn the same facing left
+                      left={"player_roll_right_1": "player_roll_left_1"}),
+})
+
+fireball = AnimationTable({
+    "fly": Animation(["fireball_right"]),
+})
+
+# The states of birds and butterflies are their colors
+bird = AnimationTable({
+    "blue": Animation(["bird_right_blue"]),
+    "red": Animation(["bird_right_red"]),
+    "yellow": Animation(["bird_right_yellow"]),
+})
+
+butterfly = AnimationTable({
+    "red": Animation(["butterfly_red_1", "butterfly_red_2", "butterfly_red_3", "butterfly_red_2"], 4),
+    "blue": Animation(["butterfly_blue_1", "butterfly_blue_2", "butterfly_blue_3", "butterfly_blue_2"], 4),
+    "green": Animation(["butterfly_green_1", "butterfly_green_2", "butterfly_green_3", "butterfly_green_2"], 4),
+})
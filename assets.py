@@ -0,0 +1,91 @@
+import pygame
+
+import resources
+import tiles
+
+# Texture atlas class
+# Packs many small images into one big page surface (shelf by shelf), every image
+# is then a subsurface of the page
+class TextureAtlas:
+    # Initialize the texture atlas class
+    def __init__(self, width=1024, padding=1):
+        self.width = width
+        self.padding = padding
+        self.pages = []
+
+    # Pack a dict of images onto a new page, returns a dict with the same keys and the packed subsurfaces
+    def pack(self, images):
+        if not images:
+            return {}
+
+        # Place the tallest images first, so every shelf wastes as little space as possible
+        order = sorted(images, key=lambda name: images[name].get_height(), reverse=True)
+
+        placements = {}
+        x = 0
+        y = 0
+        shelf_height = 0
+
+        for name in order:
+            w, h = images[name].get_size()
+
+            if w > self.width:
+                raise ValueError("{} is wider than the atlas".format(name))
+
+            # Start a new shelf if the image doesn't fit on this one
+            if x + w > self.width:
+                x = 0
+                y += shelf_height + self.padding
+                shelf_height = 0
+
+            placements[name] = pygame.Rect(x, y, w, h)
+            x += w + self.padding
+            shelf_height = max(shelf_height, h)
+
+        # The page is only as big as the packed images need
+        width = max(rect.right for rect in placements.values())
+        page = pygame.Surface((width, max(1, y + shelf_height)), pygame.SRCALPHA).convert_alpha()
+        page.fill((0, 0, 0, 0))
+
+        packed = {}
+        for name, rect in placements.items():
+            # Copy the pixels (alpha included) instead of blending them onto the page
+            page.blit(images[name], rect, special_flags=pygame.BLEND_RGBA_MAX)
+            packed[name] = page.subsurface(rect)
+
+        self.pages.append(page)
+
+        return packed
+
+# Images that aren't packed into the atlas, they are only converted
+unpacked_images = ["sky_background"]
+
+# The atlas images are packed into, every batch of loaded images gets its own page
+atlas = TextureAtlas()
+
+# Convert a dict of loaded images to the display format, and pack them into the atlas
+def convert_images(images):
+    converted = {}
+    to_pack = {}
+    for name, image in images.items():
+        if name in unpacked_images:
+            converted[name] = image.convert()
+        else:
+            to_pack[name] = image.convert_alpha()
+
+    if to_pack:
+        converted.update(atlas.pack(to_pack))
+
+    return converted
+
+# Make resources convert every image to the display format and pack them into the atlas,
+# both the images that are already loaded and all images loaded from now on
+# Can only run once a display exists, and only runs once
+def prepare():
+    if resources.manager.converter is None:
+        resources.manager.set_converter(convert_images)
+
+        # Tilesets that are already sliced have to be sliced again from their converted images
+        for tileset in tiles.tileset_list:
+            if tileset.image is not None:
+                tileset.load()
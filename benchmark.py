@@ -0,0 +1,262 @@
+import argparse
+import datetime
+import gc
+import json
+import os
+import platform
+import tempfile
+import time
+
+# headless has to be imported before pygame is initialized, it switches SDL to the dummy drivers
+import headless
+
+import numpy
+import pygame
+
+import settings
+import resources
+import assets
+import levelfile
+import main
+import spatial
+import collision
+import particles
+import profiler
+import inputs
+from rng import rng
+from animals import AnimalSystem
+
+# -- SCENARIOS --
+# A scenario takes a seed and returns a headless runner and a function that is called with
+# the game and the frame number before every frame (or None)
+
+# The first level, with nothing happening
+def idle(seed):
+    return headless.HeadlessRunner(seed), None
+
+# A fireball every frame, the cooldown is skipped
+def fireball_spam(seed):
+    def on_frame(game, frame):
+        game.previous_fireball = -1000
+        game.shoot_fireball()
+
+    return headless.HeadlessRunner(seed), on_frame
+
+# Every detail in the level burns at once, once a second the details grow back and burn again
+def mass_burn(seed):
+    def on_frame(game, frame):
+        if frame % settings.FPS == 0:
+            game.restore_details()
+            for detail in game.details:
+                detail.dead = True
+
+    return headless.HeadlessRunner(seed), on_frame
+
+# Hundreds of birds and butterflies spread over the level
+def animals(seed, count=250):
+    runner = headless.HeadlessRunner(seed)
+    game = runner.game
+    level_width = len(game.current_level[0]) * 32
+
+    for x in range(count):
+        game.animals.add_bird(rng.randint(0, level_width - 32), rng.randint(100, 400))
+        game.animals.add_butterfly(rng.randint(0, level_width - 32), rng.randint(100, 400))
+
+    return runner, None
+
+# Thousands of birds and butterflies spread over the level
+def many_animals(seed):
+    return animals(seed, 2500)
+
+# Thousands of birds on screen walking back and forth every update, so all of them land on
+# and walk into the tiles of the tile grid
+def walking_birds(seed, count=2000):
+    runner = headless.HeadlessRunner(seed)
+    game = runner.game
+
+    for x in range(count):
+        game.animals.add_bird(rng.randint(0, settings.display_width - 32), rng.randint(100, 400))
+
+    def on_frame(game, frame):
+        direction = 1 if frame // settings.FPS % 2 == 0 else -1
+        game.animals.x_velocity[:game.animals.count] = direction * 10
+
+    return runner, on_frame
+
+# Temporary directories the scenarios made files in, they are removed after the scenario has run
+temporary_directories = []
+
+# The first level repeated side by side to make a very wide level (100000 tiles)
+# The level file is saved to a temporary directory, which is removed after the scenario
+def wide_level(seed, repeats=1000):
+    layers = numpy.array(levelfile.load_level(settings.level_file))
+
+    directory = tempfile.TemporaryDirectory(ignore_cleanup_errors=True)
+    temporary_directories.append(directory)
+
+    path = os.path.join(directory.name, "wide.lvl")
+    levelfile.save_level(path, numpy.tile(layers, (1, 1, repeats)))
+
+    return headless.HeadlessRunner(seed, path), None
+
+scenarios = {
+    "idle": idle,
+    "fireball_spam": fireball_spam,
+    "mass_burn": mass_burn,
+    "animals": animals,
+    "many_animals": many_animals,
+    "walking_birds": walking_birds,
+    "wide_level": wide_level,
+}
+
+# Run a scenario for a number of frames and return the timings of every section
+# update and draw are all of Game.update and Game.draw, collision, animals and particles are
+# the parts of those spent in collision queries, in updating the animals and in the particle systems
+# The stats of the fireball pool and particle systems at the end are returned as well, and
+# how much of each layer was drawn and culled in an average frame
+def run_scenario(name, frames, seed):
+    runner = None
+    try:
+        runner, on_frame = scenarios[name](seed)
+
+        timer = profiler.Profiler()
+        timer.instrument(main.Game, "update", "update")
+        timer.instrument(main.Game, "draw", "draw")
+        timer.instrument(spatial.SpatialGroup, "collide", "collision")
+        timer.instrument(collision.TileGrid, "collide", "collision")
+        timer.instrument(collision.TileGrid, "overlap_solid", "collision")
+        timer.instrument(collision.TileGrid, "overlap_solid_rect", "collision")
+        timer.instrument(collision.TileGrid, "hits_solid", "collision")
+        timer.instrument(AnimalSystem, "update", "animals")
+        timer.instrument(particles.ParticleSystem, "update", "particles")
+        timer.instrument(particles.ParticleSystem, "draw", "particles")
+
+        # The drawn and culled counts of each layer, added up over all frames
+        culling = {}
+
+        try:
+            start = time.perf_counter()
+            for frame in range(frames):
+                if on_frame is not None:
+                    on_frame(runner.game, frame)
+
+                frame_start = time.perf_counter()
+                runner.step()
+                timer.add("frame", time.perf_counter() - frame_start)
+                timer.end_frame()
+
+                for layer, (drawn, culled) in runner.game.cull_stats.items():
+                    totals = culling.setdefault(layer, [0, 0])
+                    totals[0] += drawn
+                    totals[1] += culled
+            seconds = time.perf_counter() - start
+        finally:
+            timer.restore()
+
+        return {
+            "frames": frames,
+            "seconds": seconds,
+            "fps": frames / seconds,
+            "checksum": headless.checksum(runner.game),
+            "sections": timer.summary(),
+            "pools": runner.game.pool_stats(),
+            "culling": {layer: {"drawn": drawn / frames, "culled": culled / frames}
+                        for layer, (drawn, culled) in culling.items()},
+        }
+    finally:
+        # The level file of the runner is memory-mapped, so the runner has to be gone before it's removed
+        runner = None
+        remove_temporary_directories()
+
+# Remove the temporary directories the scenarios made
+def remove_temporary_directories():
+    # The game has reference cycles, collect it so its memory-mapped files are closed
+    gc.collect()
+    while temporary_directories:
+        temporary_directories.pop().cleanup()
+
+# Print the results of a scenario as a table
+def print_results(name, results):
+    print("{} ({:.0f} frames per second)".format(name, results["fps"]))
+    print("    {:<10} {:>8} {:>8} {:>8} {:>8} {:>8}".format("ms", "mean", "p50", "p90", "p99", "max"))
+    for section, stats in results["sections"].items():
+        print("    {:<10} {:>8.3f} {:>8.3f} {:>8.3f} {:>8.3f} {:>8.3f}".format(
+            section, stats["mean"], stats["p50"], stats["p90"], stats["p99"], stats["max"]))
+    print("    {:<10} {:>8} {:>8} {:>8}".format("pools", "capacity", "active", "high"))
+    for pool, stats in results["pools"].items():
+        print("    {:<10} {:>8} {:>8} {:>8}".format(pool, stats["capacity"], stats["active"], stats["high_water"]))
+    if results["culling"]:
+        print("    {:<18} {:>8} {:>8}".format("culling", "drawn", "culled"))
+    for layer, stats in results["culling"].items():
+        print("    {:<18} {:>8.1f} {:>8.1f}".format(layer, stats["drawn"], stats["culled"]))
+
+# Blit every image in images onto target, repeat times, and return the time it took in seconds
+def time_blits(target, images, repeat):
+    blits = [(image, ((i * 37) % settings.display_width, (i * 53) % settings.display_height))
+             for i, image in enumerate(images)]
+
+    start = time.perf_counter()
+    for x in range(repeat):
+        for image, pos in blits:
+            target.blit(image, pos)
+    return time.perf_counter() - start
+
+# Compare blitting the images as they are loaded with blitting them after the asset pipeline
+# has converted them to the display format and packed them into the atlas
+# Has to run before anything else prepares the assets
+def blit_benchmark(repeat=200):
+    display = pygame.display.set_mode((settings.display_width, settings.display_height))
+
+    names = list(resources.images)
+    resources.manager.load(names)
+
+    raw_time = time_blits(display, [resources.manager.get(name) for name in names], repeat)
+
+    assets.prepare()
+    converted_time = time_blits(display, [resources.manager.get(name) for name in names], repeat)
+
+    blits = len(names) * repeat
+    print("Blitted {} images {} times".format(len(names), repeat))
+    print("Loaded:    {:.3f}s ({:.0f} blits per second)".format(raw_time, blits / raw_time))
+    print("Converted: {:.3f}s ({:.0f} blits per second)".format(converted_time, blits / converted_time))
+    print("Speedup:   {:.2f}x".format(raw_time / converted_time))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run benchmark scenarios headless and time each part of a frame")
+    parser.add_argument("scenarios", nargs="*", help="scenarios to run (default: all of {})".format(", ".join(scenarios)))
+    parser.add_argument("--frames", type=int, default=600, help="amount of frames to run each scenario")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--replay", help="only play back an input recording, for as many frames as it has")
+    parser.add_argument("--blit", action="store_true", help="only compare loaded and converted image blitting")
+    args = parser.parse_args()
+
+    # A recorded session is run as the replay scenario
+    if args.replay:
+        recording = inputs.load_recording(args.replay)
+        scenarios["replay"] = lambda seed: (headless.HeadlessRunner(recording=recording), None)
+        args.scenarios = ["replay"]
+        args.frames = len(recording.frames)
+
+    if args.blit:
+        blit_benchmark()
+    else:
+        results = {
+            "date": datetime.datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "pygame": pygame.version.ver,
+            "frames": args.frames,
+            "seed": args.seed,
+            "scenarios": {},
+        }
+
+        for name in args.scenarios or scenarios:
+            results["scenarios"][name] = run_scenario(name, args.frames, args.seed)
+            print_results(name, results["scenarios"][name])
+
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=4)
+            print("Saved results to {}".format(args.output))
+
+    pygame.quit()
@@ -0,0 +1,169 @@
+import collections
+
+import numpy
+import pygame
+
+import tiles
+
+# What a cell of the tile grid is
+EMPTY = 0
+SOLID = 1
+TOP_SOLID = 2
+
+# A solid tile (or level border) a rect overlaps, it has a rect and a top_solid flag like a wall sprite,
+# so the collision code of the sprites works with both
+Hit = collections.namedtuple("Hit", ["rect", "top_solid"])
+
+# Tile grid class
+# Collision queries straight on the walls layer of a level (a 2D array of tile ids), so solid tiles
+# don't need a sprite each. The grid keeps one byte per cell (its kind) and a query only looks at
+# the cells the queried rect overlaps
+# Tiles from top solid tilesets can be moved through from below and from the sides (one-way platforms),
+# that is up to the sprites, which get the top_solid flag of every hit
+# Left and right of the level are the level borders, which are solid over the height of the level
+class TileGrid:
+    # Initialize the tile grid class, level_top is the y position of the first row of the level
+    def __init__(self, level, level_top=0, tile_size=32):
+        self.level = level
+        self.level_top = level_top
+        self.tile_size = tile_size
+
+        self.rows, self.columns = level.shape
+        self.width = self.columns * tile_size
+        self.height = self.rows * tile_size
+
+        # The kind of every tile id (tile ids are 16 bit), ids that aren't in the tile registry are empty
+        kinds = numpy.zeros(65536, numpy.uint8)
+        for tile_id, tile in tiles.tile_registry.items():
+            kinds[tile_id] = TOP_SOLID if tile["top_solid"] else SOLID
+
+        # The kind of every cell row by row, with a row or column of empty cells around the level so
+        # cells just outside it can be looked up as well, as bytes (fast to index one by one) and as
+        # arrays of the same memory (for checking many rects at once)
+        padded = numpy.zeros((self.rows + 2, self.columns + 2), numpy.uint8)
+        padded[1:-1, 1:-1] = kinds[level]
+        self.stride = self.columns + 2
+        self.cells = padded.tobytes()
+        self.padded_array = numpy.frombuffer(self.cells, numpy.uint8).reshape(self.rows + 2, self.columns + 2)
+        self.cell_array = self.padded_array[1:-1, 1:-1]
+
+        self.borders = [Hit(pygame.Rect(-1, level_top, 1, self.height), False),
+                        Hit(pygame.Rect(self.width, level_top, 1, self.height), False)]
+
+    # Get the solid tiles and level borders a rect overlaps, tiles are in row-major order
+    def collide(self, rect):
+        size = self.tile_size
+        hit_list = [border for border in self.borders if border.rect.colliderect(rect)]
+
+        first_col = max(0, rect.left // size)
+        last_col = min(self.columns - 1, (rect.right - 1) // size)
+        first_row = max(0, (rect.top - self.level_top) // size)
+        last_row = min(self.rows - 1, (rect.bottom - 1 - self.level_top) // size)
+
+        if first_col > last_col or first_row > last_row or rect.width <= 0 or rect.height <= 0:
+            return hit_list
+
+        cells = self.cells
+        for row in range(first_row, last_row + 1):
+            start = (row + 1) * self.stride + 1
+            for col in range(first_col, last_col + 1):
+                kind = cells[start + col]
+                if kind:
+                    hit_list.append(Hit(pygame.Rect(col * size, self.level_top + row * size, size, size),
+                                        kind == TOP_SOLID))
+
+        return hit_list
+
+    # Count the solid tiles and level borders each rect (given as arrays) overlaps, and get the y position
+    # of the top of the last one in the order collide() returns them (the lowest tile, or the top of the level
+    # for a level border), for many rects at once
+    def overlap_solid(self, x, y, width, height):
+        # A few rects are quicker to check one by one
+        if len(x) <= 16:
+            counts = []
+            tops = []
+            for rect in zip(x.tolist(), y.tolist(), width.tolist(), height.tolist()):
+                count, top = self.overlap_solid_rect(*rect)
+                counts.append(count)
+                tops.append(top)
+            return numpy.array(counts, numpy.int32), numpy.array(tops, numpy.int32)
+
+        size = self.tile_size
+        first_col = x // size
+        first_row = (y - self.level_top) // size
+        cols_over = (x + width - 1) // size - first_col
+        rows_over = (y + height - 1 - self.level_top) // size - first_row
+
+        # The level borders are one pixel wide, just outside the level
+        in_level = (y + height > self.level_top) & (y < self.level_top + self.height)
+        left_border = (x < 0) & (x + width > -1)
+        right_border = (x <= self.width) & (x + width > self.width)
+        count = (left_border & in_level).astype(numpy.int32) + (right_border & in_level)
+        last_top = numpy.full(len(x), self.level_top, numpy.int32)
+
+        # Visit the cells row by row, as many rows and columns as the biggest rect can overlap
+        # Cells outside the level are looked up in the empty border of the padded array
+        padded = self.padded_array
+        row_span = (int(height.max()) + size - 1) // size + 1
+        col_span = (int(width.max()) + size - 1) // size + 1
+        for r_offset in range(row_span):
+            r = numpy.clip(first_row + r_offset + 1, 0, self.rows + 1)
+            row_overlapped = rows_over >= r_offset
+            for c_offset in range(col_span):
+                c = numpy.clip(first_col + c_offset + 1, 0, self.columns + 1)
+                solid = (padded[r, c] != EMPTY) & row_overlapped & (cols_over >= c_offset)
+                count += solid
+                last_top[solid] = self.level_top + (r[solid] - 1) * size
+
+        return count, last_top
+
+    # overlap_solid for one rect, returns the count and the top of the last hit
+    def overlap_solid_rect(self, x, y, width, height):
+        size = self.tile_size
+        first_col = x // size
+        last_col = (x + width - 1) // size
+        first_row = (y - self.level_top) // size
+        last_row = (y + height - 1 - self.level_top) // size
+
+        count = 0
+        last_top = self.level_top
+        if y + height > self.level_top and y < self.level_top + self.height:
+            count += (x < 0 and x + width > -1) + (x <= self.width and x + width > self.width)
+
+        # Every solid cell of a row is a byte that isn't 0
+        cells = self.cells
+        first_col = max(0, first_col)
+        last_col = min(self.columns - 1, last_col)
+        if first_col <= last_col:
+            for row in range(max(0, first_row), min(self.rows - 1, last_row) + 1):
+                start = (row + 1) * self.stride + 1
+                solid = last_col - first_col + 1 - cells.count(0, start + first_col, start + last_col + 1)
+                if solid:
+                    count += solid
+                    last_top = self.level_top + row * size
+
+        return count, last_top
+
+    # Check which rects (given as arrays) overlap a solid tile or a level border
+    # The rects are never bigger than a tile, so checking the four corners is enough
+    def hits_solid(self, x, y, width, height):
+        left = numpy.floor(x).astype(numpy.int32)
+        top = numpy.floor(y).astype(numpy.int32)
+        left_cols = left // self.tile_size
+        right_cols = (left + width - 1) // self.tile_size
+        top_rows = (top - self.level_top) // self.tile_size
+        bottom_rows = (top + height - 1 - self.level_top) // self.tile_size
+
+        # The level borders are only as high as the level
+        in_level = (top + height > self.level_top) & (top < self.level_top + self.height)
+
+        hit = numpy.zeros(len(x), bool)
+        for c in (left_cols, right_cols):
+            for r in (top_rows, bottom_rows):
+                outside = (c < 0) | (c >= self.columns)
+                inside = ~outside & (r >= 0) & (r < self.rows)
+                cell = numpy.zeros(len(x), bool)
+                cell[inside] = self.cell_array[r[inside], c[inside]] != EMPTY
+                hit |= cell | (outside & in_level)
+
+        return hit
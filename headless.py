@@ -0,0 +1,110 @@
+import argparse
+import hashlib
+import os
+import time
+
+# Use SDL's dummy video and audio drivers, this has to happen before pygame is initialized
+os.environ["SDL_VIDEODRIVER"] = "dummy"
+os.environ["SDL_AUDIODRIVER"] = "dummy"
+
+import pygame
+
+import settings
+import rng
+import inputs
+import main
+
+# Get a checksum of the game state
+# Two runs with the same seed, level and input end with the same checksum
+def checksum(game):
+    state = hashlib.sha1()
+
+    state.update(repr((tuple(game.player.rect), game.player.x_velocity, game.player.y_velocity,
+                       game.cam_x_offset, game.time)).encode())
+
+    for group in (game.projectiles, game.details, game.clouds):
+        state.update(repr([tuple(sprite.rect) for sprite in group]).encode())
+
+    for system in (game.fires, game.dust, game.animals):
+        for name, dtype in system.fields:
+            state.update(getattr(system, name)[:system.count].tobytes())
+
+    return state.hexdigest()
+
+# Headless runner class
+# Runs the game state without a window, with a seeded random number generator and without
+# limiting the framerate, so the simulation runs as fast as the CPU allows
+class HeadlessRunner:
+    # Initialize the headless runner class, if draw is False only the simulation runs
+    # If an input recording is given it is played back, with the seed and level it was recorded with
+    def __init__(self, seed=0, level_path=settings.level_file, draw=True, recording=None):
+        if recording is not None:
+            seed = recording.seed
+            level_path = recording.level_path
+
+        rng.seed(seed)
+        self.draw = draw
+
+        self.control = main.Control()
+        self.display = self.control.game_display
+
+        self.game = main.Game(level_path)
+        if recording is not None:
+            self.game.input = inputs.ReplayInput(recording)
+        self.game.startup()
+
+        self.frames = 0
+
+        # Total time spent simulating and drawing, in seconds
+        self.update_time = 0
+        self.draw_time = 0
+
+    # Update (and draw) the game one frame
+    def step(self):
+        start = time.perf_counter()
+        self.game.update()
+        self.update_time += time.perf_counter() - start
+
+        if self.draw:
+            start = time.perf_counter()
+            self.game.draw(self.display)
+            self.draw_time += time.perf_counter() - start
+
+        self.frames += 1
+
+    # Run the game for a number of frames and return how long it took in seconds
+    # on_frame is called with the game and the frame number before every update (used to script scenarios)
+    def run(self, frames, on_frame=None):
+        start = time.perf_counter()
+
+        for frame in range(frames):
+            if on_frame is not None:
+                on_frame(self.game, frame)
+            self.step()
+
+        return time.perf_counter() - start
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the game without a window as fast as possible")
+    parser.add_argument("--frames", type=int, default=600, help="amount of frames to run")
+    parser.add_argument("--seed", type=int, default=0, help="random seed")
+    parser.add_argument("--level", default=settings.level_file, help="level file to play")
+    parser.add_argument("--no-draw", action="store_true", help="only run the simulation")
+    parser.add_argument("--replay", help="play back an input recording (for as many frames as it has)")
+    args = parser.parse_args()
+
+    if args.replay:
+        recording = inputs.load_recording(args.replay)
+        frames = len(recording.frames)
+    else:
+        recording = None
+        frames = args.frames
+
+    runner = HeadlessRunner(args.seed, args.level, not args.no_draw, recording)
+    seconds = runner.run(frames)
+
+    print("Ran {} frames in {:.3f}s ({:.0f} frames per second)".format(frames, seconds, frames / seconds))
+    print("Simulation: {:.3f}s, drawing: {:.3f}s".format(runner.update_time, runner.draw_time))
+    print("Checksum: {}".format(checksum(runner.game)))
+
+    pygame.quit()
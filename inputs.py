@@ -0,0 +1,161 @@
+import struct
+
+import pygame
+
+# The buttons of the game, as bits of a snapshot
+LEFT = 1
+RIGHT = 2
+JUMP = 4
+SHOOT = 8
+
+# Keys that hold down each button (the mouse holds down shoot, for continuous shooting)
+held_keys = {
+    pygame.K_a: LEFT,
+    pygame.K_d: RIGHT,
+    pygame.K_j: JUMP,
+    pygame.K_SPACE: JUMP,
+}
+
+# Keys and joystick buttons that press each button
+pressed_keys = {
+    pygame.K_j: JUMP,
+    pygame.K_SPACE: JUMP,
+    pygame.K_k: SHOOT,
+}
+
+pressed_joystick_buttons = {
+    0: JUMP,
+    2: SHOOT,
+}
+
+# Input snapshot class
+# The input of one update: the buttons that are held down, and the buttons that were pressed
+# since the last update
+class InputSnapshot:
+    # Initialize the input snapshot class
+    def __init__(self, held=0, pressed=0):
+        self.held = held
+        self.pressed = pressed
+
+    # Check if a button is held down
+    def is_held(self, button):
+        return self.held & button != 0
+
+    # Check if a button was pressed since the last update
+    def was_pressed(self, button):
+        return self.pressed & button != 0
+
+# Input recording class
+# The snapshots of a session together with the seed and level it was played with, which is
+# everything that is needed to play the session again exactly
+class InputRecording:
+    # Initialize the input recording class, frames is a list of (held, pressed) pairs
+    def __init__(self, seed, level_path, frames=None):
+        self.seed = seed
+        self.level_path = level_path
+        self.frames = frames if frames is not None else []
+
+    # Add a snapshot to the recording
+    def add(self, snapshot):
+        self.frames.append((snapshot.held, snapshot.pressed))
+
+# Live input class
+# Turns the keyboard, mouse and joystick into one snapshot per update, and records them if given a recording
+class LiveInput:
+    # Initialize the live input class
+    def __init__(self, recording=None):
+        self.recording = recording
+        self.pressed = 0
+
+    # Remember the buttons pressed by an event until the next snapshot
+    def handle_event(self, event):
+        if event.type == pygame.KEYDOWN:
+            self.pressed |= pressed_keys.get(event.key, 0)
+        elif event.type == pygame.JOYBUTTONDOWN:
+            self.pressed |= pressed_joystick_buttons.get(event.button, 0)
+
+    # Get the input for the next update
+    def snapshot(self):
+        keys = pygame.key.get_pressed()
+
+        held = 0
+        for key, button in held_keys.items():
+            if keys[key]:
+                held |= button
+
+        if pygame.mouse.get_pressed()[0]:
+            held |= SHOOT
+
+        snapshot = InputSnapshot(held, self.pressed)
+        self.pressed = 0
+
+        if self.recording is not None:
+            self.recording.add(snapshot)
+
+        return snapshot
+
+# Replay input class
+# Plays the snapshots of a recording back, when it runs out nothing is held or pressed
+class ReplayInput:
+    # Initialize the replay input class
+    def __init__(self, recording):
+        self.recording = recording
+        self.index = 0
+
+    # Events are ignored while replaying
+    def handle_event(self, event):
+        pass
+
+    # Check if every snapshot has been played
+    @property
+    def finished(self):
+        return self.index >= len(self.recording.frames)
+
+    # Get the input for the next update
+    def snapshot(self):
+        if self.finished:
+            return InputSnapshot()
+
+        held, pressed = self.recording.frames[self.index]
+        self.index += 1
+        return InputSnapshot(held, pressed)
+
+# Input recording files
+# A recording file starts with a header (magic, version, seed, frame count, level path length),
+# followed by the level path and two bytes per update: the held and the pressed buttons
+header_format = "<4sHIIH"
+header_size = struct.calcsize(header_format)
+magic = b"TIPI"
+version = 1
+
+# Save a recording to a file
+def save_recording(path, recording):
+    level_path = recording.level_path.encode()
+
+    with open(path, "wb") as f:
+        f.write(struct.pack(header_format, magic, version, recording.seed, len(recording.frames), len(level_path)))
+        f.write(level_path)
+        f.write(bytes(value for frame in recording.frames for value in frame))
+
+# Load a recording from a file
+def load_recording(path):
+    with open(path, "rb") as f:
+        data = f.read()
+
+    if len(data) < header_size:
+        raise ValueError("{} is not an input recording".format(path))
+
+    file_magic, file_version, seed, count, path_length = struct.unpack_from(header_format, data)
+
+    if file_magic != magic:
+        raise ValueError("{} is not an input recording".format(path))
+    if file_version != version:
+        raise ValueError("{} has unsupported input recording version {}".format(path, file_version))
+
+    level_path = data[header_size:header_size + path_length].decode()
+
+    values = data[header_size + path_length:]
+    if len(values) != count * 2:
+        raise ValueError("{} is truncated".format(path))
+
+    return InputRecording(seed, level_path, list(zip(values[0::2], values[1::2])))
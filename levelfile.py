@@ -0,0 +1,83 @@
+import struct
+import sys
+
+import numpy
+
+# Binary level files
+# A level file starts with a header (magic, version, width, height, layer count),
+# followed by one width * height grid of little-endian uint16 tile ids per layer
+# Version 1 stores the width and height as uint16, version 2 as uint32 so levels can be wider than 65535 tiles
+header_formats = {
+    1: "<4sHHHH",
+    2: "<4sHIIH",
+}
+magic = b"TIPL"
+version = 2
+
+# The layers of a level, in the order they are stored in the file
+layer_names = ["background_details", "walls", "details"]
+
+# Get a layer of a level (its layers in file order) by name
+def get_layer(layers, name):
+    return layers[layer_names.index(name)]
+
+# Save a list of 2D tile id arrays (all the same size) as a level file
+def save_level(path, layers):
+    layers = numpy.asarray(layers, numpy.dtype("<u2"))
+    if layers.ndim != 3 or len(layers) != len(layer_names):
+        raise ValueError("layers must be a list of {} 2D tile id arrays ({})".format(len(layer_names), ", ".join(layer_names)))
+
+    count, height, width = layers.shape
+
+    with open(path, "wb") as f:
+        f.write(struct.pack(header_formats[version], magic, version, width, height, count))
+        f.write(layers.tobytes())
+
+# Load a level file, the layers are memory-mapped as a read only (layers, height, width) uint16 array
+def load_level(path):
+    with open(path, "rb") as f:
+        header = f.read(struct.calcsize(max(header_formats.values(), key=struct.calcsize)))
+
+    if len(header) < 6:
+        raise ValueError("{} is not a level file".format(path))
+
+    file_magic, file_version = struct.unpack_from("<4sH", header)
+
+    if file_magic != magic:
+        raise ValueError("{} is not a level file".format(path))
+    if file_version not in header_formats:
+        raise ValueError("{} has unsupported level file version {}".format(path, file_version))
+
+    header_format = header_formats[file_version]
+    header_size = struct.calcsize(header_format)
+
+    if len(header) < header_size:
+        raise ValueError("{} is not a level file".format(path))
+
+    file_magic, file_version, width, height, count = struct.unpack_from(header_format, header)
+
+    if count != len(layer_names):
+        raise ValueError("{} has {} layers instead of {}".format(path, count, len(layer_names)))
+
+    return numpy.memmap(path, numpy.dtype("<u2"), "r", offset=header_size, shape=(count, height, width))
+
+# Convert the level lists in levels.py to a level file
+def convert_levels_module(path):
+    import levels
+    import tiles
+
+    layers = {"background_details": levels.level_background_details,
+              "walls": levels.level,
+              "details": levels.level_details}
+
+    save_level(path, [tiles.convert_level(layers[name]) for name in layer_names])
+
+# Running this file converts levels.py, the output path can be passed as an argument
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        output = sys.argv[1]
+    else:
+        output = "maps/level_1.lvl"
+
+    convert_levels_module(output)
+    print("Saved levels.py to {}".format(output))
@@ -1,12 +1,24 @@
-import random
+import time
 
 import pygame
 
 import settings
 import sprites
 import tiles
-import levels
+import levelfile
 import resources
+import assets
+import spatial
+import collision
+import render
+import particles
+import streaming
+import pool
+import animals
+import profiler
+import inputs
+import text
+from rng import rng, visual_rng
 
 # State template class
 class States(object):
@@ -17,6 +29,10 @@ class States(object):
         self.quit = False
         self.previous = None
 
+        # Drawn and culled counts of what the state drew in the last frame, as (drawn, culled)
+        # by layer, the profiler overlay shows them
+        self.cull_stats = {}
+
         # give all states joystick support
         if pygame.joystick.get_count() > 0:
             self.joystick = pygame.joystick.Joystick(0)
@@ -26,6 +42,11 @@ class States(object):
         else:
             self.joystick_plugged = False
 
+    # Make the state draw the whole screen next frame, for when something else drew over it
+    # (like the profiler overlay) or the window was uncovered
+    def invalidate(self):
+        pass
+
 # Menu state
 class Menu(States):
     # Initialize the menu state
@@ -35,15 +56,13 @@ class Menu(States):
 
         self.startup()
 
-    # Font rendering function
+    # Font rendering function, the text comes from the text cache
     def render_text(self, msg, color, size, dest_surf, pos):
-        font = pygame.font.Font(settings.font_file, size)
-
-        font_surf = font.render(msg, False, color)
+        font_surf = text.render(msg, color, size)
         font_rect = font_surf.get_rect()
         font_rect.center = pos
 
-        dest_surf.blit(font_surf, font_rect)
+        return dest_surf.blit(font_surf, font_rect)
 
     # Cleaning up the menu state
     def cleanup(self):
@@ -51,11 +70,20 @@ class Menu(States):
 
     # Starting the menu state
     def startup(self):
+        resources.load_group("menu")
+
         self.play_color = settings.orange
         self.quit_color = settings.black
 
         self.selected = "play"
 
+        # The colors the menu was last drawn with, None means it has to be drawn completely
+        self.drawn_colors = None
+
+    # Draw the whole menu next frame
+    def invalidate(self):
+        self.drawn_colors = None
+
     # State event handling
     def get_event(self, event):
         if event.type == pygame.KEYDOWN:
@@ -71,9 +99,7 @@ class Menu(States):
                     quit()
 
     # Update the menu state
-    def update(self, display):
-        self.draw(display)
-
+    def update(self):
         if self.selected == "play":
             self.play_color = settings.orange
         else:
@@ -85,116 +111,178 @@ class Menu(States):
             self.quit_color = settings.black
 
     # Menu state drawing
-    def draw(self, screen):
+    # The menu is only drawn when it changed, returns the rects that changed (None for the whole screen)
+    def draw(self, screen, alpha=1):
+        colors = (self.play_color, self.quit_color)
+        if colors == self.drawn_colors:
+            return []
+
+        first_draw = self.drawn_colors is None
+        self.drawn_colors = colors
+
         screen.fill((255, 255, 255))
 
-        self.render_text("PLAY", self.play_color, 75, screen, (400, 325))
-        self.render_text("QUIT", self.quit_color, 75, screen, (400, 400))
+        rects = [self.render_text("PLAY", self.play_color, 75, screen, (400, 325)),
+                 self.render_text("QUIT", self.quit_color, 75, screen, (400, 400))]
+
+        if first_draw:
+            return None
+        return rects
 
 # Game state
 class Game(States):
-    # Initialize the game state
-    def __init__(self):
+    # The layers of the render queue, in the order they are drawn
+    draw_layers = {"background": 0, "background_details": 1, "projectiles": 2, "dust": 3, "walls": 4,
+                   "player": 5, "details": 6, "animals": 7, "fires": 8}
+
+    # Initialize the game state, level_path is the level file that gets played
+    def __init__(self, level_path=settings.level_file):
         States.__init__(self)
         self.next = "menu"
 
+        self.level_path = level_path
+
+        # Where the input comes from, live input by default (can be replaced by a recording that is played back)
+        self.input = inputs.LiveInput()
+
+        # The level path the static level was built from, None until it's built
+        self.built_level_path = None
+
+        # Everything on screen is submitted to the render queue and drawn with one blits() call
+        self.render_queue = render.RenderQueue()
+
     # Cleaning up the game state
     def cleanup(self):
         pass
 
-    # Function that creates a level from a list and returns the level list
-    def create_level(self, level, solid=True, bg=False):
-        level_x = 0
-
-        # Make the bottom-left tile aligned with the bottom-left of the screen
+    # Get the y position of the top row of a level
+    # The bottom-left tile is aligned with the bottom-left of the screen
+    def get_level_top(self, level):
         if len(level) <= 20:
-            level_y = 0
+            return 0
         else:
-            level_y = 0 - (32 * (len(level) - 20))
-
-        for rows in level:
-            for cols in rows:
-                for tilesets in tiles.tileset_list:
-                    if int(cols) == tilesets.id:
-                        for tile in tilesets.all_tiles:
-                            if cols == tile["id"]:
-                                # If the tile ID is divisible by 5, top solid is true
-                                if int(cols) % 5 == 0:
-                                    w = sprites.Wall(level_x, level_y, 32, 32, image=tile["image"], top_solid = True)
-                                else:
-                                    w = sprites.Wall(level_x, level_y, 32, 32, image=tile["image"])
-                                if solid:
-                                    self.walls.add(w)
-                                elif bg:
-                                    self.background_details.add(w)
-                                else:
-                                    self.details.add(w)
-
-                level_x += 32
-            level_x = 0
-            level_y += 32
-
-        return level
-
-    # Starting the game state
-    def startup(self):
+            return 0 - (32 * (len(level) - 20))
+
+    # Starting the game state, a level path can be given to switch to another level file
+    # The static level is only built the first time a level is started, after that starting
+    # the game state (and dying) resets the level to how it started
+    def startup(self, level_path=None):
+        if level_path is not None:
+            self.level_path = level_path
+
+        if self.built_level_path != self.level_path:
+            self.build_level()
+
+        self.reset()
+
+    # Build everything in the level that doesn't move: the tile grid, the chunked layers,
+    # the level streamer and the particle systems
+    # No tiles are created here, the level streamer creates the details chunk by chunk near the camera
+    def build_level(self):
+        # Load all the images and sounds the game needs (only loads them the first time)
+        resources.load_group("game")
+        tiles.load_tilesets()
+
+        # The level layers are memory-mapped from the level file
+        layers = levelfile.load_level(self.level_path)
+
         # Sprite groups
-        self.background_details = pygame.sprite.Group()
-        self.walls = pygame.sprite.Group()
+        # Details are a spatial group, so collision checks only look at nearby tiles
         self.projectiles = pygame.sprite.Group()
-        self.fires = pygame.sprite.Group()
-        self.dust = pygame.sprite.Group()
-        self.animals = pygame.sprite.Group()
-        self.details = pygame.sprite.Group()
+        self.details = spatial.SpatialGroup()
         self.clouds = pygame.sprite.Group()
 
-        # Creating an instance of the player
-        self.player = sprites.Player(self.walls)
-
-        # Creating Animals
-        self.bird_1 = sprites.Bird(120, 400, self.walls)
-        self.bird_2 = sprites.Bird(550, 200, self.walls)
-        self.bird_3 = sprites.Bird(900, 200, self.walls)
+        # current_level is the walls layer of the level (used for camera movement)
+        self.current_level = levelfile.get_layer(layers, "walls")
+        level_top = self.get_level_top(self.current_level)
+
+        # Everything collides with the walls layer through the tile grid, so walls don't need sprites
+        # (the level borders are part of the grid)
+        self.grid = collision.TileGrid(self.current_level, level_top)
+
+        # Birds and butterflies are kept in arrays and updated all at once, birds land on the tile grid
+        self.animals = animals.AnimalSystem(self.grid)
+
+        # Fire and dust particles, fire dies when it hits a solid tile
+        # The particle arrays, particle surfaces and fireballs are all made up front so shooting doesn't allocate
+        self.fires = particles.ParticleSystem(grid=self.grid, capacity=settings.fire_capacity)
+        self.dust = particles.ParticleSystem(gravity=settings.player_grav, capacity=settings.dust_capacity)
+        particles.prebake()
+        self.fireball_pool = pool.Pool(lambda: sprites.Fireball(self.grid, self.details, self.animals),
+                                       settings.fireball_pool_size)
+
+        # The static tile layers are baked into chunks, only the chunks on screen are drawn each frame
+        level_width = len(self.current_level[0]) * 32
+        # The background details and walls never change, so they are baked straight from their layers
+        self.background_details_layer = render.TileArrayLayer(levelfile.get_layer(layers, "background_details"),
+                                                              level_top, settings.display_height)
+        self.walls_layer = render.TileArrayLayer(self.current_level, level_top, settings.display_height)
+        self.details_layer = render.ChunkedLayer(self.details, level_width, settings.display_height)
+
+        # The level streamer loads the tiles of the chunks near the camera into the tile groups,
+        # in the same order as the layers in the level file
+        layer_groups = {"background_details": (None, self.background_details_layer),
+                        "walls": (None, self.walls_layer),
+                        "details": (self.details, self.details_layer)}
+        self.streamer = streaming.LevelStreamer(layers, [layer_groups[name] for name in levelfile.layer_names],
+                                                level_top, settings.stream_margin, settings.stream_chunks_per_update)
+
+        # The sky and clouds are drawn to the background, everything else is drawn straight
+        # to the game display relative to the camera
+        self.background = pygame.Surface((settings.display_width, settings.display_height))
+        self.background.blit(resources.sky_background, (0, 0))
 
-        self.animals.add(self.bird_1)
-        self.animals.add(self.bird_2)
-        self.animals.add(self.bird_3)
+        self.built_level_path = self.level_path
 
-        self.butterfly_1 = sprites.Butterfly(120, 120, self.walls)
-        self.butterfly_2 = sprites.Butterfly(650, 350, self.walls)
-        self.butterfly_3 = sprites.Butterfly(1450, 280, self.walls)
+    # Get the part of the level that is on screen
+    def view_rect(self):
+        return pygame.Rect(int(self.cam_x_offset), 0, settings.display_width, settings.display_height)
 
-        self.animals.add(self.butterfly_1)
-        self.animals.add(self.butterfly_2)
-        self.animals.add(self.butterfly_3)
+    # Get the capacity, active count and high-water mark of the fireball pool and the particle systems
+    def pool_stats(self):
+        return {"fireballs": self.fireball_pool.stats(), "fires": self.fires.stats(), "dust": self.dust.stats()}
 
-        # Create the background details layer
-        self.create_level(levels.level_background_details, solid = False, bg = True)
+    # Put back the details that burnt, only the chunks they are in are baked again
+    def restore_details(self):
+        self.streamer.restore()
 
-        # Create the level and set current_level to its level list (used for camera movement)
-        self.current_level = self.create_level(levels.level)
+    # Reset the level to how it started, the static level is reused
+    def reset(self):
+        self.restore_details()
 
-        # Create the details Layer
-        self.create_level(levels.level_details, solid=False)
+        self.projectiles.empty()
+        self.fireball_pool.release_all()
+        self.clouds.empty()
+        self.fires.clear()
+        self.dust.clear()
 
-        # Level borders
-        self.left_border = sprites.Wall(-1, 0, 1, settings.display_height)
-        self.walls.add(self.left_border)
+        # Creating an instance of the player
+        self.player = sprites.Player(self.grid)
 
-        self.right_border = sprites.Wall(len(self.current_level[0]) * 32, 0, 1, settings.display_height)
-        self.walls.add(self.right_border)
+        # Creating Animals, they move with their own random numbers, which are seeded from rng
+        self.animals.clear(rng.getrandbits(32))
 
+        self.animals.add_bird(120, 400)
+        self.animals.add_bird(550, 200)
+        self.animals.add_bird(900, 200)
 
-        # We blit surfaces to the world surface, then blit the world surface to the game display
-        self.world_surface = pygame.Surface((len(self.current_level[0]) * 32, settings.display_height))
-        self.background = pygame.Surface((settings.display_width, settings.display_height))
-        self.background.blit(resources.sky_background, (0, 0))
+        self.animals.add_butterfly(120, 120)
+        self.animals.add_butterfly(650, 350)
+        self.animals.add_butterfly(1450, 280)
 
         # Camera variables
         self.cam_x_offset = 0
+        self.previous_cam_x_offset = 0
+
+        # Load the chunks on screen right away, the player needs ground to land on
+        self.streamer.update(self.view_rect())
 
-        # fireball variables
-        self.previous_fireball = 0
+        # Game time in milliseconds, advanced by one frame each update so the game plays
+        # the same no matter how fast it runs
+        self.time = 0
+
+        # fireball variables (start long enough ago that a fireball can be shot right away)
+        self.previous_fireball = -1000
 
         # Screen shake variables
         self.shake_amount = 10
@@ -202,13 +290,13 @@ class Game(States):
     # Player fireball function
     def shoot_fireball(self):
         # Only allow fireballs to be shot every 250 milliseconds
-        if pygame.time.get_ticks() - self.previous_fireball > 250:
+        if self.time - self.previous_fireball > 250:
             # Creating the fireball object based on player direction
             if self.player.direction == "left":
-                fb = sprites.Fireball(self.player.rect.center[0], self.player.rect.center[1] + random.randint(-10, 10), "left", self.walls, self.details, self.animals)
+                fb = self.fireball_pool.acquire(self.player.rect.center[0], self.player.rect.center[1] + rng.randint(-10, 10), "left")
 
             elif self.player.direction == "right":
-                fb = sprites.Fireball(self.player.rect.center[0], self.player.rect.center[1] + random.randint(-10, 10), "right", self.walls, self.details, self.animals)
+                fb = self.fireball_pool.acquire(self.player.rect.center[0], self.player.rect.center[1] + rng.randint(-10, 10), "right")
 
             self.projectiles.add(fb)
 
@@ -221,50 +309,72 @@ class Game(States):
             pygame.mixer.Sound.play(resources.fireball_sound)
 
             # Set previous_fireball to current time
-            self.previous_fireball = pygame.time.get_ticks()
+            self.previous_fireball = self.time
 
     # State event handling
+    # Key and button presses go to the input, which hands them to the next update
     def get_event(self, event):
         if event.type == pygame.QUIT:
             self.quit = True
 
-        if event.type == pygame.KEYDOWN:
-            if event.key == pygame.K_j or event.key == pygame.K_SPACE:
-                if self.player.jumping:
-                    self.player.test_for_jump()
-                else:
-                    self.player.jump()
+        self.input.handle_event(event)
 
-            if event.key == pygame.K_k:
-                self.shoot_fireball()
+    # Update the game state, one fixed timestep
+    # Every part of the update is timed by the frame timer (when the profiler is on)
+    def update(self):
+        timer = profiler.frame_timer
+        timer.lap("update.overhead")
 
-        if event.type == pygame.JOYBUTTONDOWN:
-            if self.joystick.get_button(2) == 1:
-                self.shoot_fireball()
+        # Everything the player does this update comes from one input snapshot
+        snapshot = self.input.snapshot()
 
-            if self.joystick.get_button(0) == 1:
-                if self.player.jumping:
-                    self.player.test_for_jump()
-                else:
-                    self.player.jump()
+        if snapshot.was_pressed(inputs.JUMP):
+            if self.player.jumping:
+                self.player.test_for_jump()
+            else:
+                self.player.jump()
+
+        if snapshot.was_pressed(inputs.SHOOT):
+            self.shoot_fireball()
 
+        self.time += 1000 / settings.FPS
 
-    # Update the game state
-    def update(self, display):
-        self.player.update()
+        # Remember where things were before this update, so drawing can interpolate between the two
+        self.previous_cam_x_offset = self.cam_x_offset
+        self.player.previous_image_rect = self.player.image_rect.copy()
+        for group in (self.projectiles, self.clouds):
+            for sprite in group:
+                sprite.previous_rect = sprite.rect.copy()
+        self.animals.remember_positions()
+        timer.lap("update.previous")
+
+        self.player.update(snapshot)
+        timer.lap("update.player")
 
         self.fires.update()
+        timer.lap("update.fires")
         self.dust.update()
+        timer.lap("update.dust")
+        # Fireballs that leave the loaded part of the level are removed, and animals
+        # outside of it wait until it's loaded again
+        for fireball in self.projectiles:
+            if not self.streamer.is_loaded(fireball.rect):
+                fireball.kill()
         self.projectiles.update()
-        self.animals.update()
+        timer.lap("update.projectiles")
+        count = self.animals.count
+        self.animals.update(self.streamer.are_loaded(self.animals.x[:count],
+                                                     self.animals.x[:count] + self.animals.width[:count]))
+        timer.lap("update.animals")
         self.clouds.update()
+        timer.lap("update.clouds")
 
         # Allow continuous shooting
-        if pygame.mouse.get_pressed()[0]:
+        if snapshot.is_held(inputs.SHOOT):
             self.shoot_fireball()
 
         # Determine if player is shooting
-        if pygame.time.get_ticks() - self.previous_fireball < 250:
+        if self.time - self.previous_fireball < 250:
             self.player.shooting = True
         else:
             self.player.shooting = False
@@ -280,128 +390,180 @@ class Game(States):
 
         # Reset game if player is out of the screen
         if self.player.rect.y > settings.display_height-60+64:
-            self.startup()
+            self.reset()
 
         # Randomly spawn clouds
-        cloud_num = random.randint(0, 700)
+        cloud_num = rng.randint(0, 700)
 
         if cloud_num == 700:
-            c = sprites.Cloud(settings.display_width, random.randint(0, 300))
+            c = sprites.Cloud(settings.display_width, rng.randint(0, 300))
             self.clouds.add(c)
+        timer.lap("update.camera")
+
+        # Load the chunks the camera is getting close to and evict the ones it left behind
+        self.streamer.update(self.view_rect())
+        timer.lap("update.streaming")
 
         # Make fireballs Burn
         for fireballs in self.projectiles:
             if fireballs.direction == "right":
-                f = sprites.Fire(fireballs.rect.center[0] - 8, fireballs.rect.center[1] + random.randint(-16, 16),
-                         random.randint(1, 3)*8, 8, fireballs.speed - 5, 0, self.walls)
+                self.fires.emit(fireballs.rect.center[0] - 8, fireballs.rect.center[1] + rng.randint(-16, 16),
+                                rng.randint(1, 3)*8, 8, fireballs.speed - 5, 0, particles.fire_color())
             elif fireballs.direction == "left":
-                f = sprites.Fire(fireballs.rect.center[0] + 8, fireballs.rect.center[1] + random.randint(-16, 16),
-                         random.randint(1, 3)*8, 8, fireballs.speed + 5, 0, self.walls)
-
-            self.fires.add(f)
+                self.fires.emit(fireballs.rect.center[0] + 8, fireballs.rect.center[1] + rng.randint(-16, 16),
+                                rng.randint(1, 3)*8, 8, fireballs.speed + 5, 0, particles.fire_color())
+        timer.lap("cleanup.fireball_fires")
 
         # Remove plants destroyed by fireballs
         for remove_plants in self.details:
             if remove_plants.dead:
                 for x in range(5):
-                    f = sprites.Fire(remove_plants.rect.center[0] + random.randint(-4, 4),
-                             remove_plants.rect.bottom, 8, random.randint(1, 3) * 8,
-                             0, -2 + random.randint(-1, 1), self.walls, 35)
-                    self.fires.add(f)
+                    self.fires.emit(remove_plants.rect.center[0] + rng.randint(-4, 4),
+                                    remove_plants.rect.bottom, 8, rng.randint(1, 3) * 8,
+                                    0, -2 + rng.randint(-1, 1), particles.fire_color(), 35)
                 remove_plants.kill()
-
-        # Remove dead fires
-        for fire in self.fires:
-            if fire.dead:
-                fire.kill()
-
-        # Remove dead dust
-        for du in self.dust:
-            if du.dead:
-                du.kill()
+                self.details_layer.invalidate(remove_plants.rect)
+        timer.lap("cleanup.details")
 
         # Make hit animals Burn and kill dead animals
-        for hit in self.animals:
-            if hit.hit:
-                f = sprites.Fire(hit.rect.center[0] + random.randint(-4, 4),
-                         hit.rect.bottom, 8, random.randint(1, 3) * 8,
-                         0, -2 + random.randint(-1, 1), self.walls, 35)
-                self.fires.add(f)
-            if hit.dead:
-                hit.kill()
+        for center_x, bottom in zip(*self.animals.hit_positions()):
+            self.fires.emit(center_x + rng.randint(-4, 4),
+                            bottom, 8, rng.randint(1, 3) * 8,
+                            0, -2 + rng.randint(-1, 1), particles.fire_color(), 35)
+        self.animals.remove_dead()
+        timer.lap("cleanup.animals")
 
         # Remove dead fireballs
         for fireballs in self.projectiles:
             if fireballs.dead:
                 if fireballs.direction == "right":
                     for x in range(5):
-                        d = sprites.Dust(fireballs.rect.right, fireballs.rect.center[1], 8, -4, random.randint(-4, 4), self.walls)
-                        self.dust.add(d)
+                        self.dust.emit(fireballs.rect.right, fireballs.rect.center[1], 8, 8, -4, rng.randint(-4, 4), particles.dust_color)
                 if fireballs.direction == "left":
                     for x in range(5):
-                        d = sprites.Dust(fireballs.rect.left, fireballs.rect.center[1], 8, 4, random.randint(-4, 4), self.walls)
-                        self.dust.add(d)
+                        self.dust.emit(fireballs.rect.left, fireballs.rect.center[1], 8, 8, 4, rng.randint(-4, 4), particles.dust_color)
                 fireballs.kill()
 
+        # Every fireball that was removed from the projectiles this update goes back to the pool
+        for fireball in list(self.fireball_pool.active):
+            if not fireball.alive():
+                self.fireball_pool.release(fireball)
+        timer.lap("cleanup.projectiles")
+
         # Dust effect upon ground impact:
         if self.player.dust > 0:
-            d = sprites.Dust(self.player.rect.center[0], self.player.rect.bottom, 8, random.randint(-5, 5), -3, self.walls)
-            self.dust.add(d)
+            self.dust.emit(self.player.rect.center[0], self.player.rect.bottom, 8, 8, rng.randint(-5, 5), -3, particles.dust_color)
             self.player.dust -= 1
 
         # Randomly spawn dust particles when player is moving
-        dust_num = random.randint(0, 40)
+        dust_num = rng.randint(0, 40)
 
         if self.player.moving and not self.player.jumping and dust_num == 30:
-            d = sprites.Dust(self.player.rect.center[0], self.player.rect.bottom, 8, random.randint(-5, 5), -3, self.walls)
-            self.dust.add(d)
+            self.dust.emit(self.player.rect.center[0], self.player.rect.bottom, 8, 8, rng.randint(-5, 5), -3, particles.dust_color)
 
         # Slowly stop screen shake
         if self.shake_amount > 0:
             self.shake_amount -= 0.5
+        timer.lap("update.effects")
+
+    # game state drawing, the whole screen changes every frame
+    # alpha is how far between the previous and the current update the frame is drawn (0 - 1)
+    # the camera, player and moving sprites are drawn interpolated between their two positions
+    def draw(self, screen, alpha=1):
+        timer = profiler.frame_timer
+        timer.lap("draw.overhead")
+
+        # Everything is drawn straight to the screen, offset by the camera
+        # If shake amount is more than 0, offset the view by a random amount between
+        # negative and positive shake amount as well
+        if self.shake_amount > 0:
+            shake_x = visual_rng.randint(int(-self.shake_amount), int(self.shake_amount))
+            shake_y = visual_rng.randint(int(-self.shake_amount), int(self.shake_amount))
+        else:
+            shake_x = 0
+            shake_y = 0
 
-        self.draw(display)
+        cam_x_offset = self.previous_cam_x_offset + (self.cam_x_offset - self.previous_cam_x_offset) * alpha
+        offset = (shake_x - int(cam_x_offset), shake_y)
 
-    # game state drawing
-    def draw(self, screen):
+        # The part of the world that is on screen
+        view_rect = pygame.Rect(-offset[0], -offset[1], settings.display_width, settings.display_height)
+
+        # Everything is submitted to its layer of the render queue, and drawn when the queue is flushed
+        queue = self.render_queue
+        layers = self.draw_layers
 
         # Draw the background
+        # Every draw call culls what is off screen, and the amount of drawn and culled
+        # sprites (or chunks for the tile layers) is stored in cull_stats
+        # The clouds are drawn onto the background itself, which is then drawn with the screen shake
         self.background.blit(resources.sky_background, (0, 0))
-        self.clouds.draw(self.background)
-        self.world_surface.blit(self.background, (0+self.cam_x_offset, 0))
-        self.background_details.draw(self.world_surface)
+        self.cull_stats["clouds"] = render.draw_group(self.background, self.clouds, self.background.get_rect(), alpha=alpha)
+        queue.layer(layers["background"]).blit(self.background, (shake_x, shake_y))
+        timer.lap("draw.background")
+
+        self.cull_stats["background_details"] = self.background_details_layer.draw(queue.layer(layers["background_details"]), view_rect, offset)
+        timer.lap("draw.background_details")
 
         # Draw projectiles & dust particles
-        self.projectiles.draw(self.world_surface)
-        self.dust.draw(self.world_surface)
+        self.cull_stats["projectiles"] = render.draw_group(queue.layer(layers["projectiles"]), self.projectiles, view_rect, offset, alpha)
+        timer.lap("draw.projectiles")
+        self.cull_stats["dust"] = self.dust.draw(queue.layer(layers["dust"]), view_rect, offset)
+        timer.lap("draw.dust")
 
         # Draw the player and walls
-        self.walls.draw(self.world_surface)
-        self.player.draw(self.world_surface)
+        self.cull_stats["walls"] = self.walls_layer.draw(queue.layer(layers["walls"]), view_rect, offset)
+        timer.lap("draw.walls")
+        self.player.draw(queue.layer(layers["player"]), offset, alpha)
+        timer.lap("draw.player")
 
         # Draw animals, details and fires
-        self.details.draw(self.world_surface)
-        self.animals.draw(self.world_surface)
-        self.fires.draw(self.world_surface)
+        self.cull_stats["details"] = self.details_layer.draw(queue.layer(layers["details"]), view_rect, offset)
+        timer.lap("draw.details")
+        self.cull_stats["animals"] = self.animals.draw(queue.layer(layers["animals"]), view_rect, offset, alpha)
+        timer.lap("draw.animals")
+        self.cull_stats["fires"] = self.fires.draw(queue.layer(layers["fires"]), view_rect, offset)
+        timer.lap("draw.fires")
 
-        # Blit the world surface to the main display
-        # If shake amount is more than 0, blit the world at a random location between
-        # negative and positive shake amount, instead of 0, 0
-        if self.shake_amount > 0:
-            screen.blit(self.world_surface, (random.randint(int(-self.shake_amount), int(self.shake_amount))-self.cam_x_offset,
-                                                        random.randint(int(-self.shake_amount), int(self.shake_amount))))
-        else:
-            screen.blit(self.world_surface, (0-self.cam_x_offset, 0))
+        queue.flush(screen)
+        timer.lap("draw.flush")
 
 # Control class
 class Control:
     # Initialize the control class
     def __init__(self):
+        # Time how long it takes to get to the first frame
+        self.start_time = time.perf_counter()
+        self.first_frame = True
+
+        # Initialize the mixer before pygame so that sounds load with the right settings
+        pygame.mixer.pre_init(44100, -16, 1, 512)
         pygame.init()
         self.playing = True
         self.game_display = pygame.display.set_mode((settings.display_width, settings.display_height))
+
+        # Now that there is a display, convert all images to its pixel format
+        assets.prepare()
         self.clock = pygame.time.Clock()
 
+        # The simulation runs in fixed timesteps, the time that hasn't been simulated yet builds up in accumulator
+        self.timestep = 1 / settings.FPS
+        self.accumulator = 0
+
+        # The rects of the display the state changed in the last frame, None for the whole display
+        self.dirty_rects = None
+
+        # If True, the whole state is drawn and the whole display updated next frame
+        self.repaint = False
+
+        # If True, the state got events that no fixed timestep has seen yet, so it isn't idle
+        self.input_pending = False
+
+        # Frame profiler overlay, toggled with F3 (F4 saves the recorded frames to a CSV file)
+        self.overlay = profiler.ProfilerOverlay(profiler.frame_timer)
+        self.show_overlay = False
+        self.caption_frames = 0
+
     # Setup the state control
     def setup_states(self, state_dict, start_state):
         self.state_dict = state_dict
@@ -421,35 +583,130 @@ class Control:
 
     # Game loop
     def loop(self):
+        timer = profiler.frame_timer
+
         while self.playing:
-            self.clock.tick(settings.FPS)
+            self.accumulator += self.clock.tick(settings.FPS) / 1000
+            timer.start_frame()
+
+            # States that time their own sections lap them inside update and draw, the overhead
+            # sections only get the time around them (and all of it for states that don't)
             self.events()
+            timer.lap("events")
             self.update()
-            pygame.display.update()
-            pygame.display.set_caption(settings.title + " running at " + str(int(self.clock.get_fps())) + " frames per second")
+            timer.lap("update.overhead")
+            self.draw()
+            timer.lap("draw.overhead")
+
+            if self.repaint:
+                self.dirty_rects = None
+                self.repaint = False
+
+            if self.show_overlay:
+                self.overlay.draw(self.game_display, self.state.cull_stats)
+                self.dirty_rects = None
+                timer.lap("overlay")
+
+            # Only the parts of the display that changed are updated
+            if self.dirty_rects is None:
+                pygame.display.update()
+            elif self.dirty_rects:
+                pygame.display.update(self.dirty_rects)
+            timer.lap("display")
+            timer.end_frame()
+
+            # If nothing changed and no events wait for an update, the state is idle,
+            # so sleep until there is an event (or idle_wait runs out)
+            if self.playing and self.dirty_rects == [] and not self.input_pending:
+                event = pygame.event.wait(settings.idle_wait)
+                if event.type != pygame.NOEVENT:
+                    pygame.event.post(event)
+
+            if self.first_frame:
+                self.first_frame = False
+                if settings.profile_startup:
+                    resources.manager.report()
+                    print("First frame after {:.1f} ms".format((time.perf_counter() - self.start_time) * 1000))
+
+            # The caption only changes once a second
+            self.caption_frames -= 1
+            if self.caption_frames <= 0:
+                pygame.display.set_caption("{} running at {} frames per second".format(settings.title, int(self.clock.get_fps())))
+                self.caption_frames = settings.FPS
 
     # Event handling
     def events(self):
         for event in pygame.event.get():
+            self.input_pending = True
+
             if event.type == pygame.QUIT:
                 self.playing = False
+
+            # The window was uncovered, so its contents have to be drawn again
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.invalidate()
+
+            if event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_F3:
+                    self.show_overlay = not self.show_overlay
+                    profiler.frame_timer.set_enabled(self.show_overlay)
+
+                    # The overlay was drawn over the state, which has to cover it up again
+                    self.invalidate()
+                if event.key == pygame.K_F4 and profiler.frame_timer.count > 0:
+                    profiler.frame_timer.write_csv(settings.profile_csv)
+                    print("Saved {} frames to {}".format(profiler.frame_timer.count, settings.profile_csv))
+
             self.state.get_event(event)
 
+    # Draw the whole state and update the whole display next frame
+    def invalidate(self):
+        self.state.invalidate()
+        self.repaint = True
+
     # Update the control class
     def update(self):
-            if self.state.quit:
-                self.playing = False
-            elif self.state.done:
-                self.switch_state()
-            self.state.update(self.game_display)
-
-game = Control()
-state_dict = {
-    "menu": Menu(),
-    "game": Game()
-}
-game.setup_states(state_dict, "menu")
-game.loop()
-
-pygame.quit()
-quit()
+        if self.state.quit:
+            self.playing = False
+        elif self.state.done:
+            self.switch_state()
+
+        # Run as many fixed timesteps as have built up, but at most max_catch_up_steps per frame
+        steps = 0
+        while self.accumulator >= self.timestep and steps < settings.max_catch_up_steps:
+            self.state.update()
+            self.accumulator -= self.timestep
+            steps += 1
+            self.input_pending = False
+
+        # If the simulation can't keep up, drop the time it couldn't catch up on instead of
+        # falling further and further behind
+        if self.accumulator >= self.timestep:
+            self.accumulator %= self.timestep
+
+    # Draw the current state, in between its last two updates
+    def draw(self):
+        self.dirty_rects = self.state.draw(self.game_display, self.accumulator / self.timestep)
+
+if __name__ == "__main__":
+    game = Control()
+    state_dict = {
+        "menu": Menu(),
+        "game": Game()
+    }
+
+    # Record the input of the session, so it can be played again with headless.py or benchmark.py
+    if settings.input_recording is not None:
+        seed = rng.getrandbits(32)
+        rng.seed(seed)
+        state_dict["game"].input = inputs.LiveInput(inputs.InputRecording(seed, state_dict["game"].level_path))
+
+    game.setup_states(state_dict, "menu")
+    game.loop()
+
+    if settings.input_recording is not None:
+        inputs.save_recording(settings.input_recording, state_dict["game"].input.recording)
+        print("Saved the input recording to {}".format(settings.input_recording))
+
+    pygame.quit()
+    quit()
@@ -0,0 +1,200 @@
+import numpy
+import pygame
+
+from rng import rng
+
+# Dust particles are always the same brown and 8x8
+dust_color = (114, 68, 70)
+dust_sizes = [(8, 8)]
+
+# Get a random fire color, the green channel is rounded to steps of 25 so that all
+# fire particles can share a small set of pre-tinted surfaces
+def fire_color():
+    green = 15 + rng.randint(0, 200)
+    return (255, 15 + (green - 15) // 25 * 25, 15)
+
+# Every color fire_color() can return, and the sizes of fire particles (8, 16 or 24 wide or high)
+fire_colors = [(255, 15 + step * 25, 15) for step in range(9)]
+fire_sizes = [(8, 8), (16, 8), (24, 8), (8, 16), (8, 24)]
+
+# Particle surface cache class
+# Particle surfaces filled with a color and with their alpha already set, one per (color, width, height, alpha)
+# Alphas are rounded to steps of alpha_step, so a small set of surfaces is enough for every particle
+# and no surface has its alpha changed while drawing
+class SurfaceCache:
+    # Initialize the particle surface cache class
+    def __init__(self, alpha_step=16):
+        self.alpha_step = alpha_step
+        self.surfaces = {}
+
+    # Round alphas (an array) to the alpha steps, fully opaque stays fully opaque
+    def quantise(self, alpha):
+        return numpy.minimum((alpha + self.alpha_step // 2) // self.alpha_step * self.alpha_step, 255)
+
+    # Get the surface for a color, size and (rounded) alpha
+    def get(self, color, width, height, alpha):
+        key = (color, width, height, alpha)
+        surface = self.surfaces.get(key)
+
+        if surface is None:
+            surface = pygame.Surface((width, height))
+            if pygame.display.get_surface() is not None:
+                surface = surface.convert()
+            surface.fill(color)
+            surface.set_alpha(alpha)
+            self.surfaces[key] = surface
+
+        return surface
+
+    # Create the surfaces of every alpha step for every color and (width, height) size up front
+    def prebake(self, colors, sizes):
+        alphas = self.quantise(numpy.arange(256)).tolist()
+        for color in colors:
+            for width, height in sizes:
+                for alpha in dict.fromkeys(alphas):
+                    self.get(color, width, height, alpha)
+
+# The surface cache shared by every particle system
+surface_cache = SurfaceCache()
+
+# Create the surfaces of every fire and dust particle, surfaces that already exist are kept
+def prebake():
+    surface_cache.prebake(fire_colors, fire_sizes)
+    surface_cache.prebake([dust_color], dust_sizes)
+
+# Particle system class
+# Keeps every particle in contiguous NumPy arrays and updates them all in one vectorised step,
+# instead of having one sprite (with its own surface) per particle
+class ParticleSystem:
+    # The per-particle arrays and their types
+    fields = (("x", numpy.float32), ("y", numpy.float32),
+              ("x_velocity", numpy.float32), ("y_velocity", numpy.float32),
+              ("alpha", numpy.int16), ("draw_alpha", numpy.int16), ("fade_rate", numpy.int16),
+              ("width", numpy.int16), ("height", numpy.int16), ("color", numpy.int16))
+
+    # Initialize the particle system class
+    # gravity is added to the y velocity every update
+    # If grid is given (a collision.TileGrid), particles die when they hit a solid tile during X-movement
+    def __init__(self, gravity=0, grid=None, capacity=256):
+        self.gravity = gravity
+        self.grid = grid
+
+        self.count = 0
+        self.allocate(capacity)
+
+        # The most particles that were alive at the same time
+        self.high_water = 0
+
+        # Colors are stored as indexes into the palette, the surfaces come from the shared surface cache
+        self.palette = []
+        self.palette_index = {}
+
+    # Allocate the particle arrays, keeping the particles that are alive
+    def allocate(self, capacity):
+        for name, dtype in self.fields:
+            array = numpy.zeros(capacity, dtype)
+            if self.count:
+                array[:self.count] = getattr(self, name)[:self.count]
+            setattr(self, name, array)
+
+        self.capacity = capacity
+
+    # Get how many particles there is room for, how many are alive and the most that were alive at once
+    def stats(self):
+        return {"capacity": self.capacity, "active": self.count, "high_water": self.high_water}
+
+    # Remove every particle, the arrays and palette are kept
+    def clear(self):
+        self.count = 0
+
+    # Create a particle, x is its left side and y is its bottom (like the old Fire and Dust sprites)
+    def emit(self, x, y, width, height, x_velocity, y_velocity, color, fade_rate=25):
+        if self.count == self.capacity:
+            self.allocate(self.capacity * 2)
+
+        if color not in self.palette_index:
+            self.palette_index[color] = len(self.palette)
+            self.palette.append(color)
+
+        i = self.count
+        self.x[i] = x
+        self.y[i] = y - height
+        self.x_velocity[i] = x_velocity
+        self.y_velocity[i] = y_velocity
+        self.alpha[i] = 500 + rng.randint(-150, 150)
+        # New particles are drawn fully opaque until their first update
+        self.draw_alpha[i] = 255
+        self.fade_rate[i] = fade_rate
+        self.width[i] = width
+        self.height[i] = height
+        self.color[i] = self.palette_index[color]
+
+        self.count += 1
+        self.high_water = max(self.high_water, self.count)
+
+    # Update every particle
+    def update(self):
+        n = self.count
+        if n == 0:
+            return
+
+        x = self.x[:n]
+        y = self.y[:n]
+
+        x += self.x_velocity[:n]
+
+        # Check if the particles hit any walls during X-movement
+        if self.grid is not None:
+            dead = self.grid.hits_solid(x, y, self.width[:n], self.height[:n])
+        else:
+            dead = numpy.zeros(n, bool)
+
+        y += self.y_velocity[:n]
+        self.y_velocity[:n] += self.gravity
+
+        # Fade out, the alpha from before fading is the one that gets drawn
+        self.draw_alpha[:n] = numpy.minimum(self.alpha[:n], 255)
+        self.alpha[:n] -= self.fade_rate[:n]
+
+        dead |= self.alpha[:n] < 0
+
+        # Remove dead particles by moving the living ones to the front of the arrays
+        if dead.any():
+            alive = ~dead
+            self.count = int(alive.sum())
+            for name, dtype in self.fields:
+                array = getattr(self, name)
+                array[:self.count] = array[:n][alive]
+
+    # Draw the particles that overlap view_rect, offset moves the particles from world space to the target
+    # Every particle is drawn with a surface from the surface cache, in one batch
+    # Returns how many particles were drawn and culled
+    def draw(self, surface, view_rect, offset=(0, 0)):
+        n = self.count
+        if n == 0:
+            return 0, 0
+
+        # Particles are drawn at whole pixels, their positions are rounded down
+        x = numpy.floor(self.x[:n]).astype(numpy.int32)
+        y = numpy.floor(self.y[:n]).astype(numpy.int32)
+
+        visible = numpy.nonzero((x + self.width[:n] > view_rect.left) & (x < view_rect.right) &
+                                (y + self.height[:n] > view_rect.top) & (y < view_rect.bottom))[0]
+
+        # The positions on the target, as ints so pygame doesn't have to convert them
+        left = (x[visible] + int(offset[0])).tolist()
+        top = (y[visible] + int(offset[1])).tolist()
+
+        palette = self.palette
+        get = surface_cache.get
+        alpha = surface_cache.quantise(self.draw_alpha[visible])
+
+        surface.blits([(get(palette[color], width, height, a), position)
+                       for color, width, height, a, position in zip(self.color[visible].tolist(),
+                                                                    self.width[visible].tolist(),
+                                                                    self.height[visible].tolist(),
+                                                                    alpha.tolist(),
+                                                                    zip(left, top))],
+                      False)
+
+        return len(visible), n - len(visible)
@@ -0,0 +1,47 @@
+# Object pool class
+# Keeps objects that are used for a short time (like fireballs) around after they are released,
+# so they can be reset and used again instead of creating a new object every time
+# The objects need a reset() method, acquire() passes its arguments on to it
+class Pool:
+    # Initialize the pool class, factory creates a new object and capacity objects are created right away
+    def __init__(self, factory, capacity=0):
+        self.factory = factory
+
+        self.free = [factory() for x in range(capacity)]
+        self.created = capacity
+
+        # The objects that are acquired and not released yet (a dict with no values, so it keeps its order)
+        self.active = {}
+
+        # The most objects that were acquired at the same time
+        self.high_water = 0
+
+    # Get an object from the pool and reset it, a new object is only created if the pool is empty
+    def acquire(self, *args):
+        if self.free:
+            obj = self.free.pop()
+        else:
+            obj = self.factory()
+            self.created += 1
+
+        obj.reset(*args)
+
+        self.active[obj] = None
+        self.high_water = max(self.high_water, len(self.active))
+
+        return obj
+
+    # Give an object back to the pool, releasing an object twice does nothing
+    def release(self, obj):
+        if obj in self.active:
+            del self.active[obj]
+            self.free.append(obj)
+
+    # Give every acquired object back to the pool
+    def release_all(self):
+        self.free.extend(self.active)
+        self.active.clear()
+
+    # Get how many objects the pool has, how many are in use and the most that were in use at once
+    def stats(self):
+        return {"capacity": self.created, "active": len(self.active), "high_water": self.high_water}
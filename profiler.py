@@ -0,0 +1,245 @@
+import csv
+import time
+
+import numpy
+import pygame
+
+import settings
+
+# Profiler class
+# Collects how long named sections of code take, frame by frame
+class Profiler:
+    # Initialize the profiler class
+    def __init__(self):
+        # One dict of section name to seconds per finished frame
+        self.frames = []
+        self.current = {}
+
+        # The functions that were replaced by timed versions, as (owner, name, original)
+        self.wrapped = []
+
+        # How many calls of each section are running, a call inside another call of the same
+        # section (like overlap_solid checking a rect with overlap_solid_rect) is only counted once
+        self.depth = {}
+
+    # Add time to a section of the current frame
+    def add(self, section, seconds):
+        self.current[section] = self.current.get(section, 0) + seconds
+
+    # Finish the current frame
+    def end_frame(self):
+        self.frames.append(self.current)
+        self.current = {}
+
+    # Replace owner.name (usually a method of a class) with a version that adds its run time to section
+    def instrument(self, owner, name, section):
+        original = getattr(owner, name)
+        profiler = self
+
+        def timed(*args, **kwargs):
+            depth = profiler.depth.get(section, 0)
+            profiler.depth[section] = depth + 1
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                profiler.depth[section] = depth
+                if depth == 0:
+                    profiler.add(section, time.perf_counter() - start)
+
+        setattr(owner, name, timed)
+        self.wrapped.append((owner, name, original))
+
+    # Put back every function that was instrumented
+    def restore(self):
+        for owner, name, original in reversed(self.wrapped):
+            setattr(owner, name, original)
+        self.wrapped = []
+
+    # Get the section names, in the order they were first timed
+    def sections(self):
+        names = {}
+        for frame in self.frames:
+            for name in frame:
+                names[name] = None
+        return list(names)
+
+    # Get mean, percentiles and max of every section in milliseconds
+    def summary(self):
+        result = {}
+
+        for name in self.sections():
+            times = numpy.array([frame.get(name, 0) for frame in self.frames]) * 1000
+            result[name] = {
+                "mean": float(times.mean()),
+                "p50": float(numpy.percentile(times, 50)),
+                "p90": float(numpy.percentile(times, 90)),
+                "p99": float(numpy.percentile(times, 99)),
+                "max": float(times.max()),
+            }
+
+        return result
+
+# Frame timer class
+# Records how long each section of every frame takes into a ring buffer of the last capacity frames
+# Sections are timed with laps: lap(section) adds the time since the previous lap to section,
+# so every section only costs one perf_counter call
+class FrameTimer:
+    # Initialize the frame timer class
+    def __init__(self, capacity=240, sections=32):
+        self.capacity = capacity
+        self.enabled = False
+
+        # One row per frame, one column per section, in seconds
+        self.times = numpy.zeros((capacity, sections))
+        self.frame_times = numpy.zeros(capacity)
+        self.columns = {}
+
+        # The row of the current frame and the amount of finished frames in the buffer
+        self.index = 0
+        self.count = 0
+
+        self.frame_start = 0
+        self.last = 0
+
+    # Turn timing on or off, the buffer starts empty every time it's turned on
+    def set_enabled(self, enabled):
+        self.enabled = enabled
+        self.times[:] = 0
+        self.index = 0
+        self.count = 0
+        self.frame_start = self.last = time.perf_counter()
+
+    # Start timing a frame
+    def start_frame(self):
+        if self.enabled:
+            self.frame_start = self.last = time.perf_counter()
+
+    # Add the time since the last lap to section
+    def lap(self, section):
+        if self.enabled:
+            now = time.perf_counter()
+
+            column = self.columns.get(section)
+            if column is None:
+                column = self.add_section(section)
+
+            self.times[self.index, column] += now - self.last
+            self.last = now
+
+    # Give a new section a column, the buffer grows if it's out of columns
+    def add_section(self, section):
+        column = len(self.columns)
+        if column == self.times.shape[1]:
+            self.times = numpy.hstack((self.times, numpy.zeros(self.times.shape)))
+
+        self.columns[section] = column
+        return column
+
+    # Finish the current frame and move on to the next row of the buffer
+    def end_frame(self):
+        if self.enabled:
+            self.frame_times[self.index] = time.perf_counter() - self.frame_start
+
+            self.index = (self.index + 1) % self.capacity
+            self.count = min(self.count + 1, self.capacity)
+            self.times[self.index] = 0
+
+    # Get the rows of the finished frames, oldest first
+    def rows(self, frames=None):
+        if frames is None or frames > self.count:
+            frames = self.count
+        return (numpy.arange(self.index - frames, self.index)) % self.capacity
+
+    # Get the mean time of every section over the last frames, in milliseconds, slowest first
+    def averages(self, frames=60):
+        rows = self.rows(frames)
+        if len(rows) == 0:
+            return []
+
+        means = self.times[rows].mean(axis=0) * 1000
+        return sorted(((section, means[column]) for section, column in self.columns.items()),
+                      key=lambda item: item[1], reverse=True)
+
+    # Write the buffer to a CSV file, one line per frame with the frame time and every section in milliseconds
+    def write_csv(self, path):
+        sections = list(self.columns)
+
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["frame"] + sections)
+
+            for row in self.rows():
+                writer.writerow(["{:.4f}".format(self.frame_times[row] * 1000)] +
+                                ["{:.4f}".format(self.times[row, self.columns[section]] * 1000) for section in sections])
+
+# The frame timer the game reports its sections to
+frame_timer = FrameTimer()
+
+# Profiler overlay class
+# Draws a graph of the recent frame times, the slowest sections of a frame timer and how much
+# of each layer was drawn and culled
+class ProfilerOverlay:
+    # Initialize the profiler overlay class, sections and layers are how many of each are shown
+    def __init__(self, timer, sections=12, layers=10):
+        self.timer = timer
+        self.sections = sections
+        self.layers = layers
+
+        self.font = pygame.font.Font(settings.font_file, 20)
+        self.budget = 1000 / settings.FPS
+
+        # The graph is 2 pixels per millisecond, frames over budget are drawn in red
+        self.graph_height = 80
+        self.scale = 2
+
+        self.panel = pygame.Surface((timer.capacity + 100, self.graph_height + 30 + 16 * (sections + layers + 1)))
+        self.panel.set_alpha(200)
+
+        # The section text only changes a few times per second, not every frame
+        self.text = []
+        self.text_age = 0
+
+    # Render the section breakdown and the cull stats, as a list of (name, value) text surfaces
+    def render_text(self, cull_stats):
+        frame_ms = self.timer.frame_times[self.timer.rows(60)].mean() * 1000
+        lines = [(section, "{:.2f} ms".format(ms))
+                 for section, ms in [("frame", frame_ms)] + self.timer.averages()[:self.sections]]
+        lines += [(layer, "{} drawn, {} culled".format(drawn, culled))
+                  for layer, (drawn, culled) in list(cull_stats.items())[:self.layers]]
+
+        self.text = [(self.font.render(name, False, settings.white),
+                      self.font.render(value, False, settings.white)) for name, value in lines]
+
+    # Draw the overlay onto surface, cull_stats are the (drawn, culled) counts by layer of the last frame
+    def draw(self, surface, cull_stats=None):
+        if self.timer.count == 0:
+            return
+
+        self.text_age -= 1
+        if self.text_age <= 0:
+            self.render_text(cull_stats or {})
+            self.text_age = 15
+
+        self.panel.fill(settings.black)
+
+        # Frame time graph, the newest frame is on the right
+        bottom = 10 + self.graph_height
+        rows = self.timer.rows()
+        left = 10 + self.timer.capacity - len(rows)
+        for x, ms in enumerate((self.timer.frame_times[rows] * 1000).tolist()):
+            color = settings.green if ms <= self.budget else settings.red
+            height = min(self.graph_height, int(ms * self.scale))
+            pygame.draw.line(self.panel, color, (left + x, bottom), (left + x, bottom - height))
+
+        # The frame budget line
+        budget_y = bottom - int(self.budget * self.scale)
+        pygame.draw.line(self.panel, settings.light_gray, (10, budget_y), (self.panel.get_width() - 10, budget_y))
+
+        right = self.panel.get_width() - 10
+        for n, (name, ms) in enumerate(self.text):
+            y = bottom + 10 + n * 16
+            self.panel.blit(name, (10, y))
+            self.panel.blit(ms, (right - ms.get_width(), y))
+
+        surface.blit(self.panel, (0, 0))
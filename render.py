@@ -0,0 +1,184 @@
+import numpy
+import pygame
+
+import tiles
+
+# Chunked layer class
+# Bakes a group of static tiles into fixed-width chunk surfaces, so drawing the layer
+# only costs one blit per visible chunk instead of one blit per tile
+# Chunks are baked when they are first drawn (or by bake()), and can be evicted again
+class ChunkedLayer:
+    # Initialize the chunked layer class
+    def __init__(self, group, level_width, height, chunk_width=512):
+        self.group = group
+        self.level_width = level_width
+        self.height = height
+        self.chunk_width = chunk_width
+
+        self.chunk_count = max(1, -(-level_width // chunk_width))
+
+        # Baked chunk surfaces, by chunk index
+        self.chunks = {}
+
+        # Chunks that have to be baked again before they are drawn
+        self.dirty = set()
+
+        # The tiles that overlap each chunk by chunk index, used when a chunk has to be baked
+        # (dicts with no values, so they keep their order and a tile can't be in a chunk twice)
+        self.chunk_sprites = {}
+        self.add(group)
+
+    # Get the range of chunk indexes a rect overlaps
+    def chunks_for(self, rect):
+        first = max(0, rect.left // self.chunk_width)
+        last = min(self.chunk_count - 1, (rect.right - 1) // self.chunk_width)
+
+        return range(first, last + 1)
+
+    # Get the world space rect of a chunk
+    def chunk_rect(self, index):
+        x = index * self.chunk_width
+        return pygame.Rect(x, 0, min(self.chunk_width, self.level_width - x), self.height)
+
+    # Get an empty surface for a chunk
+    def new_surface(self, rect):
+        surface = pygame.Surface(rect.size, pygame.SRCALPHA)
+        if pygame.display.get_surface() is not None:
+            surface = surface.convert_alpha()
+        return surface
+
+    # Blit every tile that is still in the group onto a fresh chunk surface
+    def bake(self, index):
+        rect = self.chunk_rect(index)
+
+        self.chunk_sprites[index] = {s: None for s in self.chunk_sprites.get(index, ()) if self.group.has(s)}
+
+        surface = self.new_surface(rect)
+        surface.blits([(s.image, (s.rect.x - rect.x, s.rect.y)) for s in self.chunk_sprites[index]], False)
+
+        self.chunks[index] = surface
+        self.dirty.discard(index)
+
+    # Mark the chunks under rect as changed (for example when a detail tile burns)
+    def invalidate(self, rect):
+        self.dirty.update(self.chunks_for(rect))
+
+    # Put tiles (back) into the chunks they overlap, they have to be in the group as well
+    def add(self, sprites):
+        for sprite in sprites:
+            for index in self.chunks_for(sprite.rect):
+                self.chunk_sprites.setdefault(index, {})[sprite] = None
+                self.dirty.add(index)
+
+    # Forget a chunk and its tiles, it's baked again if it's drawn
+    def evict(self, index):
+        self.chunks.pop(index, None)
+        self.chunk_sprites.pop(index, None)
+        self.dirty.discard(index)
+
+    # Draw the chunks that overlap view_rect, offset moves the chunks from world space to the target
+    # Returns how many chunks were drawn and how many were culled
+    def draw(self, surface, view_rect, offset=(0, 0)):
+        visible = self.chunks_for(view_rect)
+
+        for index in visible:
+            if index in self.dirty or index not in self.chunks:
+                self.bake(index)
+
+            surface.blit(self.chunks[index], (index * self.chunk_width + offset[0], offset[1]))
+
+        return len(visible), self.chunk_count - len(visible)
+
+# Tile array layer class
+# A chunked layer that bakes its chunks straight from a 2D array of tile ids (like a layer of a level file),
+# for layers that never change, so their tiles don't need a sprite each
+class TileArrayLayer(ChunkedLayer):
+    # Initialize the tile array layer class, level_top is the y position of the first row of the array
+    def __init__(self, level, level_top, height, chunk_width=512, tile_size=32):
+        ChunkedLayer.__init__(self, (), level.shape[1] * tile_size, height, chunk_width)
+        self.level = level
+        self.level_top = level_top
+        self.tile_size = tile_size
+
+    # Blit every tile in the columns of a chunk onto a fresh chunk surface
+    def bake(self, index):
+        rect = self.chunk_rect(index)
+        first = rect.x // self.tile_size
+        level = self.level[:, first:first + -(-rect.width // self.tile_size)]
+
+        blits = []
+        rows, cols = numpy.nonzero(level)
+        for row, col, tile_id in zip(rows.tolist(), cols.tolist(), level[rows, cols].tolist()):
+            tile = tiles.tile_registry.get(tile_id)
+            if tile is not None:
+                blits.append((tile["image"], ((first + col) * self.tile_size - rect.x, self.level_top + row * self.tile_size)))
+
+        surface = self.new_surface(rect)
+        surface.blits(blits, False)
+
+        self.chunks[index] = surface
+        self.dirty.discard(index)
+
+# Render queue class
+# Collects everything that is drawn in a frame by layer, and draws it all with one blits() call
+# Layers are drawn from the lowest key to the highest, and within a layer in the order things were submitted
+class RenderQueue:
+    # Initialize the render queue class
+    def __init__(self):
+        self.layers = {}
+
+    # Get the layer with a key, it has blit() and blits() like a surface, so anything that
+    # draws to a surface can submit to it instead
+    def layer(self, key):
+        layer = self.layers.get(key)
+        if layer is None:
+            layer = self.layers[key] = QueueLayer()
+        return layer
+
+    # Draw everything that was submitted onto target and empty the queue, returns how many blits there were
+    def flush(self, target):
+        blits = []
+        for key in sorted(self.layers):
+            blits.extend(self.layers[key].items)
+            self.layers[key].items.clear()
+
+        target.blits(blits, False)
+        return len(blits)
+
+# Queue layer class
+# A layer of a render queue, blits are remembered until the queue is flushed
+class QueueLayer:
+    # Initialize the queue layer class
+    def __init__(self):
+        self.items = []
+
+    # Submit one blit, with the same arguments as Surface.blit
+    def blit(self, source, dest, area=None, special_flags=0):
+        if area is None and not special_flags:
+            self.items.append((source, dest))
+        else:
+            self.items.append((source, dest, area, special_flags))
+
+    # Submit a sequence of blits, with the same arguments as Surface.blits
+    def blits(self, blit_sequence, doreturn=True):
+        self.items.extend(blit_sequence)
+
+# Get where to draw a rect that moved from previous to current, alpha of the way there (0 - 1)
+def interpolate(previous, current, alpha):
+    if previous is None or alpha >= 1:
+        return current
+
+    return current.move(int((previous.x - current.x) * (1 - alpha)), int((previous.y - current.y) * (1 - alpha)))
+
+# Draw the sprites in a group that overlap view_rect, offset moves the sprites from world space to the target
+# Sprites outside view_rect are culled before blitting, returns how many sprites were drawn and culled
+# If alpha is less than 1, sprites with a previous_rect are drawn interpolated between it and their rect
+def draw_group(surface, group, view_rect, offset=(0, 0), alpha=1):
+    sprites = group.sprites()
+    visible = view_rect.collidelistall([sprite.rect for sprite in sprites])
+
+    surface.blits([(sprites[index].image,
+                    interpolate(getattr(sprites[index], "previous_rect", None), sprites[index].rect, alpha).move(offset))
+                   for index in visible], False)
+
+    return len(visible), len(sprites) - len(visible)
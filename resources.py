@@ -1,117 +1,188 @@
+import time
+
 import pygame
 
-# Initialize pygame so that sounds can load
-pygame.mixer.pre_init(44100, -16, 1, 512)
-pygame.init()
-
-# -- IMAGES --
-
-# Player sprites
-player_walk_1_right = pygame.image.load("sprites/player_walk_1_right.png")
-player_walk_2_right = pygame.image.load("sprites/player_walk_2_right.png")
-player_walk_3_right = pygame.image.load("sprites/player_walk_3_right.png")
-player_walk_4_right = pygame.image.load("sprites/player_walk_4_right.png")
-
-player_walk_1_left = pygame.image.load("sprites/player_walk_1_left.png")
-player_walk_2_left = pygame.image.load("sprites/player_walk_2_left.png")
-player_walk_3_left = pygame.image.load("sprites/player_walk_3_left.png")
-player_walk_4_left = pygame.image.load("sprites/player_walk_4_left.png")
-
-player_walk_list_right = [player_walk_1_right, player_walk_2_right,
-                          player_walk_3_right, player_walk_4_right]
-
-player_walk_list_left = [player_walk_1_left, player_walk_2_left,
-                          player_walk_3_left, player_walk_4_left]
-
-player_jump_right = pygame.image.load("sprites/player_jump_right.png")
-player_jump_left = pygame.image.load("sprites/player_jump_left.png")
-
-player_roll_right_1 = pygame.image.load("sprites/player_roll_right_1.png")
-player_roll_right_2 = pygame.image.load("sprites/player_roll_right_2.png")
-player_roll_right_3 = pygame.image.load("sprites/player_roll_right_3.png")
-player_roll_right_4 = pygame.image.load("sprites/player_roll_right_4.png")
-
-player_roll_list_right = [player_roll_right_1, player_roll_right_2, player_roll_right_3,
-                          player_roll_right_4, player_roll_right_2, player_roll_right_1]
-
-player_roll_left_1 = pygame.image.load("sprites/player_roll_left_1.png")
-player_roll_left_2 = pygame.image.load("sprites/player_roll_left_2.png")
-player_roll_left_3 = pygame.image.load("sprites/player_roll_left_3.png")
-player_roll_left_4 = pygame.image.load("sprites/player_roll_left_4.png")
-
-player_roll_list_left = [player_roll_left_1, player_roll_left_2, player_roll_left_3,
-                          player_roll_left_4, player_roll_left_2, player_roll_left_1]
-
-player_shoot_right = pygame.image.load("sprites/player_shoot_right.png")
-player_shoot_left = pygame.image.load("sprites/player_shoot_left.png")
-
-# Attack sprites
-fireball_right = pygame.image.load("sprites/fireball_right.png")
-fireball_left = pygame.image.load("sprites/fireball_left.png")
-
-# Animals
-bird_left_blue = pygame.image.load("sprites/bird_left_blue.png")
-bird_right_blue = pygame.image.load("sprites/bird_right_blue.png")
-bird_left_red = pygame.image.load("sprites/bird_left_red.png")
-bird_right_red = pygame.image.load("sprites/bird_right_red.png")
-bird_left_yellow = pygame.image.load("sprites/bird_left_yellow.png")
-bird_right_yellow = pygame.image.load("sprites/bird_right_yellow.png")
-
-butterfly_red_1 = pygame.image.load("sprites/butterfly_red_1.png")
-butterfly_red_2 = pygame.image.load("sprites/butterfly_red_2.png")
-butterfly_red_3 = pygame.image.load("sprites/butterfly_red_3.png")
-butterfly_list_red = [butterfly_red_1, butterfly_red_2, butterfly_red_3, butterfly_red_2]
-
-butterfly_blue_1 = pygame.image.load("sprites/butterfly_blue_1.png")
-butterfly_blue_2 = pygame.image.load("sprites/butterfly_blue_2.png")
-butterfly_blue_3 = pygame.image.load("sprites/butterfly_blue_3.png")
-butterfly_list_blue = [butterfly_blue_1, butterfly_blue_2, butterfly_blue_3, butterfly_blue_2]
-
-butterfly_green_1 = pygame.image.load("sprites/butterfly_green_1.png")
-butterfly_green_2 = pygame.image.load("sprites/butterfly_green_2.png")
-butterfly_green_3 = pygame.image.load("sprites/butterfly_green_3.png")
-butterfly_list_green = [butterfly_green_1, butterfly_green_2, butterfly_green_3, butterfly_green_2]
-
-# Tilesets
-tileset_template = pygame.image.load("sprites/tileset_template.png")
-tileset_grass = pygame.image.load("sprites/tileset_grass.png")
-tileset_details = pygame.image.load("sprites/tileset_details.png")
-tileset_oak_trees = pygame.image.load("sprites/tileset_oak_trees.png")
-tileset_house_1 = pygame.image.load("sprites/tileset_house_1.png")
-tileset_platforms = pygame.image.load("sprites/tileset_platforms.png")
-
-# Backgrounds & clouds
-sky_background = pygame.image.load("sprites/background.png")
-cloud = pygame.image.load("sprites/cloud.png")
-
-# User interface
-mana_bar = pygame.image.load("sprites/manabar.png")
-
-# -- SOUNDS --
-#jump = pygame.mixer.Sound("sounds/jump.wav")
-roll = pygame.mixer.Sound("sounds/roll.wav")
-footstep_1 = pygame.mixer.Sound("sounds/footstep_1.wav")
-fireball_sound = pygame.mixer.Sound("sounds/fireball.wav")
-
-# -- SPRITE LISTS -- (used for pixel format converting)
-player_list = [player_walk_1_right, player_walk_2_right, player_walk_3_right,
-               player_walk_4_right, player_walk_1_left, player_walk_2_left,
-               player_walk_3_left, player_walk_4_left, player_jump_right,
-               player_jump_left, player_roll_right_1, player_roll_right_2,
-               player_roll_right_3, player_roll_right_4, player_roll_right_2,
-               player_roll_right_1, player_roll_left_1, player_roll_left_2,
-               player_roll_left_3, player_roll_left_4, player_roll_left_2,
-               player_roll_left_1, player_shoot_right]
-
-attack_list = [fireball_right, fireball_left]
-
-animal_list = [bird_left_blue, bird_right_blue, bird_left_red, bird_right_red,
-               bird_left_yellow, bird_right_yellow, butterfly_red_1, butterfly_red_2,
-               butterfly_red_3, butterfly_blue_1, butterfly_blue_2, butterfly_blue_3,
-               butterfly_green_1, butterfly_green_2, butterfly_green_3]
-
-tileset_list = [tileset_grass, tileset_details, tileset_oak_trees, tileset_house_1]
-
-background_list = [sky_background, cloud]
-
-all_sprites = [player_list, attack_list, animal_list, tileset_list, background_list]
+import settings
+
+# -- MANIFEST --
+# Every resource, by name. Resources are only loaded the first time they are used
+# (as resources.<name>), or when the group they are in is loaded
+# Sprites are only loaded facing right, the animation module mirrors them to face left
+# (except for frames that look different facing left)
+
+images = {
+    # Player sprites
+    "player_walk_1_right": "sprites/player_walk_1_right.png",
+    "player_walk_2_right": "sprites/player_walk_2_right.png",
+    "player_walk_3_right": "sprites/player_walk_3_right.png",
+    "player_walk_4_right": "sprites/player_walk_4_right.png",
+
+    "player_jump_right": "sprites/player_jump_right.png",
+
+    "player_roll_right_1": "sprites/player_roll_right_1.png",
+    "player_roll_right_2": "sprites/player_roll_right_2.png",
+    "player_roll_right_3": "sprites/player_roll_right_3.png",
+    "player_roll_right_4": "sprites/player_roll_right_4.png",
+    "player_roll_left_1": "sprites/player_roll_left_1.png",
+
+    "player_shoot_right": "sprites/player_shoot_right.png",
+
+    # Attack sprites
+    "fireball_right": "sprites/fireball_right.png",
+
+    # Animals
+    "bird_right_blue": "sprites/bird_right_blue.png",
+    "bird_right_red": "sprites/bird_right_red.png",
+    "bird_right_yellow": "sprites/bird_right_yellow.png",
+
+    "butterfly_red_1": "sprites/butterfly_red_1.png",
+    "butterfly_red_2": "sprites/butterfly_red_2.png",
+    "butterfly_red_3": "sprites/butterfly_red_3.png",
+
+    "butterfly_blue_1": "sprites/butterfly_blue_1.png",
+    "butterfly_blue_2": "sprites/butterfly_blue_2.png",
+    "butterfly_blue_3": "sprites/butterfly_blue_3.png",
+
+    "butterfly_green_1": "sprites/butterfly_green_1.png",
+    "butterfly_green_2": "sprites/butterfly_green_2.png",
+    "butterfly_green_3": "sprites/butterfly_green_3.png",
+
+    # Tilesets
+    "tileset_template": "sprites/tileset_template.png",
+    "tileset_grass": "sprites/tileset_grass.png",
+    "tileset_details": "sprites/tileset_details.png",
+    "tileset_oak_trees": "sprites/tileset_oak_trees.png",
+    "tileset_house_1": "sprites/tileset_house_1.png",
+    "tileset_platforms": "sprites/tileset_platforms.png",
+
+    # Backgrounds & clouds
+    "sky_background": "sprites/background.png",
+    "cloud": "sprites/cloud.png",
+
+    # User interface
+    "mana_bar": "sprites/manabar.png",
+}
+
+sounds = {
+    #"jump": "sounds/jump.wav",
+    "roll": "sounds/roll.wav",
+    "footstep_1": "sounds/footstep_1.wav",
+    "fireball_sound": "sounds/fireball.wav",
+}
+
+# Fonts are (file, size)
+fonts = {
+    "smallfont": (settings.font_file, 35),
+    "medfont": (settings.font_file, 50),
+    "largefont": (settings.font_file, 75),
+    "hugefont": (settings.font_file, 150),
+}
+
+tileset_names = ["tileset_grass", "tileset_details", "tileset_oak_trees", "tileset_house_1", "tileset_platforms"]
+
+# The resources each state needs, loaded in bulk when the state starts
+groups = {
+    "menu": ["largefont"],
+
+    "game": [name for name in images if name.startswith(("player_", "fireball_", "bird_", "butterfly_"))] +
+            tileset_names + ["sky_background", "cloud"] + list(sounds),
+
+    "editor": tileset_names + ["smallfont", "medfont", "largefont", "hugefont"],
+}
+
+# Resource manager class
+# Loads the resources in the manifest on first use and keeps them cached
+class ResourceManager:
+    # Initialize the resource manager class
+    # namespace is the dict loaded resources are stored in (the resources module), so that
+    # after the first access resources.<name> is a plain attribute lookup
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.cache = {}
+
+        # Converter is a function that takes a dict of freshly loaded images and returns them converted
+        # It's set by assets.prepare() once a display exists
+        self.converter = None
+
+        # Startup profiler, load time in seconds and amount of resources loaded per group
+        self.timings = {}
+        self.counts = {}
+        self.loaded_groups = set()
+
+    # Load the resources in names that aren't loaded yet, returns how many were loaded
+    def load(self, names):
+        new_images = {}
+        count = 0
+
+        for name in names:
+            if name in self.cache:
+                continue
+
+            if name in images:
+                new_images[name] = pygame.image.load(images[name])
+            elif name in sounds:
+                self.cache[name] = pygame.mixer.Sound(sounds[name])
+            elif name in fonts:
+                self.cache[name] = pygame.font.Font(*fonts[name])
+            else:
+                raise AttributeError("There is no resource called {}".format(name))
+
+            count += 1
+
+        # Images are converted together, so they can be packed together
+        if new_images:
+            if self.converter is not None:
+                new_images = self.converter(new_images)
+            self.cache.update(new_images)
+
+        for name in names:
+            self.namespace[name] = self.cache[name]
+
+        return count
+
+    # Get a resource, loading it if needed
+    def get(self, name):
+        if name not in self.cache:
+            self.load([name])
+        return self.cache[name]
+
+    # Load all the resources of a group at once and time it
+    def load_group(self, group):
+        if group in self.loaded_groups:
+            return
+
+        start = time.perf_counter()
+        count = self.load(groups[group])
+
+        self.timings[group] = self.timings.get(group, 0) + time.perf_counter() - start
+        self.counts[group] = self.counts.get(group, 0) + count
+        self.loaded_groups.add(group)
+
+    # Set the image converter and convert the images that are already loaded
+    def set_converter(self, converter):
+        self.converter = converter
+
+        loaded = {name: value for name, value in self.cache.items() if name in images}
+        if loaded:
+            self.cache.update(converter(loaded))
+
+        for name in self.cache:
+            if name in self.namespace:
+                self.namespace[name] = self.cache[name]
+
+    # Print how long each group took to load
+    def report(self):
+        for group in self.timings:
+            print("Loaded {} {} resources in {:.1f} ms".format(self.counts[group], group, self.timings[group] * 1000))
+
+manager = ResourceManager(globals())
+
+# Load a group of resources (menu, game or editor)
+def load_group(group):
+    manager.load_group(group)
+
+# Lazily load resources when they are used as resources.<name>
+def __getattr__(name):
+    if name in images or name in sounds or name in fonts:
+        return manager.get(name)
+    raise AttributeError("module {} has no attribute {}".format(__name__, name))
@@ -0,0 +1,14 @@
+import random
+
+# The random number generator the game uses, instead of the global random module
+# Seeding it makes a run repeatable (used by the headless mode)
+rng = random.Random()
+
+# Random number generator for things that only change how a frame looks (like screen shake)
+# Drawing can happen any amount of times per update, so it must not use rng
+visual_rng = random.Random()
+
+# Seed the random number generators, None seeds them from the system
+def seed(value=None):
+    rng.seed(value)
+    visual_rng.seed(value)
@@ -1,6 +1,3 @@
-from pygame import font
-font.init()
-
 # Colors
 white = (255, 255, 255)
 black = (0, 0,  0)
@@ -18,13 +15,38 @@ display_height = 640
 title = "Platformer"
 FPS = 60
 
+# The most simulation steps that are run to catch up before drawing a frame
+max_catch_up_steps = 5
+
+# How long an idle screen (like the menu) sleeps waiting for an event, in milliseconds
+idle_wait = 1000
+
+# Level variables
+level_file = "maps/level_1.lvl"
+
+# How far past the edges of the screen the level is kept loaded (in pixels), and how many
+# chunks of the level are loaded or evicted per update at most
+stream_margin = 1024
+stream_chunks_per_update = 1
+
+# How many fireballs, fire particles and dust particles there is room for when a level starts
+# (more are added when needed, but that allocates while playing)
+fireball_pool_size = 32
+fire_capacity = 1024
+dust_capacity = 256
+
 # Player variables
 player_acc = 1
 player_grav = 0.5
 
-# Font variables
+# Font variables (the fonts themselves are loaded by resources)
 font_file = "fonts/8-Bit-Madness.ttf"
-smallfont = font.Font(font_file, 35)
-medfont = font.Font(font_file, 50)
-largefont = font.Font(font_file, 75)
-hugefont = font.Font(font_file, 150)
+
+# Print how long loading took after the first frame
+profile_startup = False
+
+# File the frame profiler saves to (F3 shows the profiler, F4 saves it)
+profile_csv = "profile.csv"
+
+# File the input of a session is recorded to, None doesn't record
+input_recording = None
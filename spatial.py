@@ -0,0 +1,117 @@
+import pygame
+
+# Spatial hash class
+# Sprites are bucketed into a grid of cells, so a collision query only has to look
+# at the sprites in the cells the queried rect overlaps instead of every sprite
+class SpatialHash:
+    # Initialize the spatial hash class
+    def __init__(self, cell_size=32):
+        self.cell_size = cell_size
+
+        # Maps (column, row) to a dict of the sprites in that cell
+        self.cells = {}
+
+        # Maps each sprite to the cells it was inserted into
+        self.sprite_cells = {}
+
+        # Insertion order of each sprite, so queries return hits in the same order
+        # as iterating the sprite group would
+        self.order = {}
+        self.counter = 0
+
+    # Get the cells a rect overlaps
+    def cells_for(self, rect):
+        left = rect.left // self.cell_size
+        top = rect.top // self.cell_size
+        right = max(left, (rect.right - 1) // self.cell_size)
+        bottom = max(top, (rect.bottom - 1) // self.cell_size)
+
+        return [(x, y) for x in range(left, right + 1) for y in range(top, bottom + 1)]
+
+    # Add a sprite to every cell its rect overlaps
+    def insert(self, sprite):
+        if sprite in self.sprite_cells:
+            self.remove(sprite)
+
+        cells = self.cells_for(sprite.rect)
+        for cell in cells:
+            self.cells.setdefault(cell, {})[sprite] = None
+
+        self.sprite_cells[sprite] = cells
+        self.order[sprite] = self.counter
+        self.counter += 1
+
+    # Remove a sprite from the hash
+    def remove(self, sprite):
+        cells = self.sprite_cells.pop(sprite, None)
+        if cells is None:
+            return
+
+        for cell in cells:
+            bucket = self.cells[cell]
+            del bucket[sprite]
+            if not bucket:
+                del self.cells[cell]
+
+        del self.order[sprite]
+
+    # Re-bucket a sprite after its rect has moved
+    def move(self, sprite):
+        order = self.order.get(sprite)
+        self.insert(sprite)
+        if order is not None:
+            self.order[sprite] = order
+
+    # Remove every sprite from the hash
+    def clear(self):
+        self.cells.clear()
+        self.sprite_cells.clear()
+        self.order.clear()
+
+    # Return the sprites whose rect collides with rect, in insertion order
+    def query(self, rect):
+        found = []
+        seen = set()
+
+        for cell in self.cells_for(rect):
+            bucket = self.cells.get(cell)
+            if bucket is None:
+                continue
+
+            for sprite in bucket:
+                if sprite not in seen:
+                    seen.add(sprite)
+                    if rect.colliderect(sprite.rect):
+                        found.append(sprite)
+
+        if len(found) > 1:
+            found.sort(key=self.order.__getitem__)
+
+        return found
+
+# Sprite group that keeps its sprites in a spatial hash
+# Only meant for sprites that don't move, like walls and details. If a sprite does move,
+# call move() on the group afterwards to keep the hash up to date
+class SpatialGroup(pygame.sprite.Group):
+    # Initialize the spatial group class
+    def __init__(self, *sprites, cell_size=32):
+        self.hash = SpatialHash(cell_size)
+        pygame.sprite.Group.__init__(self, *sprites)
+
+    # Keep the hash in sync when sprites are added or removed (including kill() and empty())
+    def add_internal(self, sprite, layer=None):
+        pygame.sprite.Group.add_internal(self, sprite, layer)
+        self.hash.insert(sprite)
+
+    def remove_internal(self, sprite):
+        pygame.sprite.Group.remove_internal(self, sprite)
+        self.hash.remove(sprite)
+
+    # Re-bucket a sprite after its rect has moved
+    def move(self, sprite):
+        if self.has(sprite):
+            self.hash.move(sprite)
+
+    # Return the sprites in the group that collide with rect
+    def collide(self, rect):
+        return self.hash.query(rect)
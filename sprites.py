@@ -1,8 +1,11 @@
 import pygame
-import random
 
+from rng import rng
 from settings import *
-from resources import *
+import resources
+import render
+import inputs
+import animation
 
 # Wizard base class
 class Wizard(pygame.sprite.Sprite):
@@ -117,10 +120,8 @@ class Wizard(pygame.sprite.Sprite):
     # If space is pressed and the jump rect is touching the ground, jump automaticly right after landing
     # This makes the game feel more responsive and prevents the "i pressed space, why didnt i jump" - situations
     def test_for_jump(self):
-        for tiles in self.solid_list:
-            if self.jump_rect.colliderect(tiles.rect):
-                self.should_jump = True
-                break
+        if self.solid_list.collide(self.jump_rect):
+            self.should_jump = True
 
     # Update the player class
     def update(self):
@@ -137,7 +138,7 @@ class Wizard(pygame.sprite.Sprite):
             self.rect.x += self.x_velocity
 
         # Check if the player hit any walls during X-movement
-        hit_list = pygame.sprite.spritecollide(self, self.solid_list, False)
+        hit_list = self.solid_list.collide(self.rect)
         for hits in hit_list:
             # If top solid is true, the tile can be moved through on the X-Axis
             if not hits.top_solid:
@@ -159,7 +160,7 @@ class Wizard(pygame.sprite.Sprite):
                 self.y_velocity = -5
 
         # Check if the player hit any walls during Y-movement
-        hit_list = pygame.sprite.spritecollide(self, self.solid_list, False)
+        hit_list = self.solid_list.collide(self.rect)
         for hits in hit_list:
             if self.y_velocity > 0:
 
@@ -196,8 +197,8 @@ class Wizard(pygame.sprite.Sprite):
         self.image_rect.bottom = self.rect.bottom
 
     # Player drawing function
-    def draw(self, display):
-            display.blit(self.image, self.image_rect)
+    def draw(self, display, offset=(0, 0)):
+            display.blit(self.image, self.image_rect.move(offset))
 
 
 # Player class
@@ -206,9 +207,10 @@ class Player(pygame.sprite.Sprite):
     def __init__(self, solid_list):
         pygame.sprite.Sprite.__init__(self)
 
-        self.image = player_walk_1_right
+        self.image = animation.player["walk", "right"][0]
         self.image_rect = self.image.get_rect()
         self.image_rect.center = (-1000, -1000)
+        self.previous_image_rect = None
         self.rect = pygame.Rect((-1000, -1000, 51, 112))
         self.rect.center = (64, 300)
 
@@ -232,11 +234,10 @@ class Player(pygame.sprite.Sprite):
         self.should_roll = False
         self.roll_index = 0
         self.roll_counter = 0
-        self.roll_list = player_roll_list_right
+        self.roll_direction = "right"
 
         self.walk_index = 0
         self.walk_counter = 0
-        self.walk_list = player_walk_list_right
         self.direction = "right"
         self.footstep_counter = 0
 
@@ -247,16 +248,17 @@ class Player(pygame.sprite.Sprite):
         # Solid list is the sprite group that contains the walls
         self.solid_list = solid_list
 
-    # Player class event handling
-    def events(self):
+    # Player class event handling, snapshot is the input of this update
+    def events(self, snapshot):
         #Reset moving & acceleration
         self.moving = False
         self.acceleration = 0
 
-        # Movement keys handling
-        keys = pygame.key.get_pressed()
+        # Movement buttons handling
+        left = snapshot.is_held(inputs.LEFT)
+        right = snapshot.is_held(inputs.RIGHT)
 
-        if keys[pygame.K_a] and not self.left_lock:
+        if left and not self.left_lock:
             self.right_lock = True
             self.moving = True
             self.acceleration = -player_acc
@@ -264,7 +266,7 @@ class Player(pygame.sprite.Sprite):
         else:
             self.right_lock = False
 
-        if keys[pygame.K_d] and not self.right_lock:
+        if right and not self.right_lock:
             self.left_lock = True
             self.moving = True
             self.acceleration = player_acc
@@ -272,13 +274,13 @@ class Player(pygame.sprite.Sprite):
         else:
             self.left_lock = False
 
-        if not keys[pygame.K_a] and not keys[pygame.K_d]:
+        if not left and not right:
             if self.x_velocity != 0:
                 self.moving = True
             self.accelerate(self.acceleration)
 
         # Check if space is still held
-        if keys[pygame.K_j] or keys[pygame.K_SPACE]:
+        if snapshot.is_held(inputs.JUMP):
             self.space = True
         elif self.space:
             self.space = False
@@ -323,14 +325,12 @@ class Player(pygame.sprite.Sprite):
     # If space is pressed and the jump rect is touching the ground, jump automaticly right after landing
     # This makes the game feel more responsive and prevents the "aw shit i pressed space why didnt i jump" - situations
     def test_for_jump(self):
-        for tiles in self.solid_list:
-            if self.jump_rect.colliderect(tiles.rect):
-                self.should_jump = True
-                break
+        if self.solid_list.collide(self.jump_rect):
+            self.should_jump = True
 
-    # Update the player class
-    def update(self):
-        self.events()
+    # Update the player class with the input of this update
+    def update(self, snapshot):
+        self.events(snapshot)
 
         # Change direciton based on velocity
         if self.x_velocity > 0:
@@ -353,7 +353,7 @@ class Player(pygame.sprite.Sprite):
                 self.direction = "left"
 
         # Check if the player hit any walls during X-movement
-        hit_list = pygame.sprite.spritecollide(self, self.solid_list, False)
+        hit_list = self.solid_list.collide(self.rect)
         for hits in hit_list:
             # If top solid is true, the tile can be moved through on the X-Axis
             if not hits.top_solid:
@@ -382,7 +382,7 @@ class Player(pygame.sprite.Sprite):
                 self.y_velocity = -5
 
         # Check if the player hit any walls during Y-movement
-        hit_list = pygame.sprite.spritecollide(self, self.solid_list, False)
+        hit_list = self.solid_list.collide(self.rect)
         for hits in hit_list:
             if self.y_velocity > 0:
 
@@ -391,7 +391,7 @@ class Player(pygame.sprite.Sprite):
                     if self.should_roll == False and self.y_velocity > 18:
                         if self.x_velocity == self.x_top_speed or self.x_velocity == -self.x_top_speed:
                             self.should_roll = True
-                            pygame.mixer.Sound.play(roll)
+                            pygame.mixer.Sound.play(resources.roll)
 
                     # Create dust upon impact
                     if self.dust == -1:
@@ -416,61 +416,54 @@ class Player(pygame.sprite.Sprite):
         else:
             self.jumping = True
 
-        # Change list based on direction
-        if self.direction == "left":
-            self.walk_list = player_walk_list_left
-        elif self.direction == "right":
-            self.walk_list = player_walk_list_right
+        # Every frame comes from the animation table, by state and direction
+        walk_frames = animation.player["walk", self.direction]
+        walk_time = animation.player.frame_time("walk")
 
         # Walk animations and footstep sounds
         if self.x_velocity != 0 and not self.jumping:
-            self.walk_counter = (self.walk_counter + 1) % 9
+            self.walk_counter = (self.walk_counter + 1) % walk_time
 
-            if self.walk_counter == 8:
-                self.walk_index = (self.walk_index + 1) % 4
-                self.image = self.walk_list[self.walk_index]
+            if self.walk_counter == walk_time - 1:
+                self.walk_index = (self.walk_index + 1) % len(walk_frames)
+                self.image = walk_frames[self.walk_index]
 
             self.footstep_counter = (self.footstep_counter + 1) % 20
 
             if self.footstep_counter == 5:
-                pygame.mixer.Sound.play(footstep_1)
+                pygame.mixer.Sound.play(resources.footstep_1)
 
         else:
             self.walk_index = 0
-            self.image = self.walk_list[self.walk_index]
+            self.image = walk_frames[self.walk_index]
 
         # Prioritize jumping animations over walking animations & set dust to -1 while jumping
         if self.jumping:
-
             self.dust = -1
-
-            if self.direction == "left":
-                self.image = player_jump_left
-            elif self.direction == "right":
-                self.image = player_jump_right
+            self.image = animation.player["jump", self.direction][0]
 
         # Shooting "animation"
         if self.shooting:
-            if self.direction == "right":
-                self.image = player_shoot_right
-            if self.direction == "left":
-                self.image = player_shoot_left
+            self.image = animation.player["shoot", self.direction][0]
 
-        # Player rolling
+        # Player rolling, the roll keeps its direction if the player stops
         if self.should_roll:
             if self.x_velocity < 0:
-                self.roll_list = player_roll_list_left
+                self.roll_direction = "left"
             elif self.x_velocity > 0:
-                self.roll_list = player_roll_list_right
+                self.roll_direction = "right"
 
-            self.roll_counter = (self.roll_counter + 1) % 5
+            roll_frames = animation.player["roll", self.roll_direction]
+            roll_time = animation.player.frame_time("roll")
 
-            if self.roll_counter == 4:
+            self.roll_counter = (self.roll_counter + 1) % roll_time
+
+            if self.roll_counter == roll_time - 1:
                 self.roll_index += 1
 
-            self.image = self.roll_list[self.roll_index]
+            self.image = roll_frames[self.roll_index]
 
-            if self.roll_index >= 5:
+            if self.roll_index >= len(roll_frames) - 1:
                 self.roll_index = 0
                 self.roll_counter = 0
                 self.should_roll = False
@@ -486,31 +479,44 @@ class Player(pygame.sprite.Sprite):
         self.image_rect.center = self.rect.center
         self.image_rect.bottom = self.rect.bottom
 
-    # Player drawing function
-    def draw(self, display):
-        display.blit(self.image, self.image_rect)
+    # Player drawing function, offset moves the player from world space to the display
+    # alpha is how far between the previous and current position the player is drawn (0 - 1)
+    def draw(self, display, offset=(0, 0), alpha=1):
+        rect = render.interpolate(self.previous_image_rect, self.image_rect, alpha)
+        display.blit(self.image, rect.move(offset))
 
 # Fireball class
+# Fireballs come from a pool.Pool, so a fireball is created once and reset every time it's shot
 class Fireball(pygame.sprite.Sprite):
     # Initialize the fireball class
-    def __init__(self, x, y, direction, solid_list, plant_list, animal_list):
+    def __init__(self, solid_list, plant_list, animal_list):
         pygame.sprite.Sprite.__init__(self)
 
-        self.direction = direction
         self.solid_list = solid_list
         self.plant_list = plant_list
         self.animal_list = animal_list
 
+        self.rect = pygame.Rect(0, 0, 0, 0)
+
+        self.reset(0, 0, "right")
+
+    # Shoot the fireball from (x, y) in a direction
+    def reset(self, x, y, direction):
+        self.direction = direction
+
+        self.image = animation.fireball["fly", self.direction][0]
+
         if self.direction == "right":
-            self.image = fireball_right
             self.speed = 15
         elif self.direction == "left":
-            self.image = fireball_left
             self.speed = -15
 
-        self.rect = self.image.get_rect()
+        self.rect.size = self.image.get_size()
         self.rect.center = (x, y)
 
+        # Where the fireball was before its last shot mustn't be used for drawing
+        self.previous_rect = None
+
         self.dead = False
 
     # Update the fireball class
@@ -519,181 +525,20 @@ class Fireball(pygame.sprite.Sprite):
         self.rect.x += self.speed
 
         # Check if the fireball hit any walls during X-movement
-        hit_list = pygame.sprite.spritecollide(self, self.solid_list, False)
+        hit_list = self.solid_list.collide(self.rect)
         for hits in hit_list:
             if abs(self.rect.bottom - hits.rect.top) > 10:
                 self.dead = True
 
         # Burn grass and flowers away
-        kill_flowers = pygame.sprite.spritecollide(self, self.plant_list, False)
+        kill_flowers = self.plant_list.collide(self.rect)
         for hits in kill_flowers:
             hits.dead = True
 
         # Kill animals hit by fireball :(
-        kill_animals = pygame.sprite.spritecollide(self, self.animal_list, False)
-        for hits in kill_animals:
-            hits.hit = True
+        if self.animal_list.hit_rect(self.rect):
             self.kill()
 
-# Bird class
-class Bird(pygame.sprite.Sprite):
-    # Initialize the bird class
-    def __init__(self, x, y, solid_list):
-        pygame.sprite.Sprite.__init__(self)
-
-        self.color = random.randint(1, 3)
-
-        if self.color == 1:
-            self.image = bird_right_blue
-        elif self.color == 2:
-            self.image = bird_right_red
-        elif self.color == 3:
-            self.image = bird_right_yellow
-
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
-
-        self.solid_list = solid_list
-
-        self.y_top_speed = 30
-
-        self.x_velocity = 0
-        self.y_velocity = 0
-
-        self.hit = False
-        self.dead = False
-
-    def update(self):
-
-        if self.color == 1:
-            if self.x_velocity > 0:
-                self.image = bird_right_blue
-            elif self.x_velocity < 0:
-                self.image = bird_left_blue
-
-        if self.color == 2:
-            if self.x_velocity > 0:
-                self.image = bird_right_red
-            elif self.x_velocity < 0:
-                self.image = bird_left_red
-
-        if self.color == 3:
-            if self.x_velocity > 0:
-                self.image = bird_right_yellow
-            elif self.x_velocity < 0:
-                self.image = bird_left_yellow
-
-        # X-Axis movement
-        self.rect.x += self.x_velocity
-
-        hit_list = pygame.sprite.spritecollide(self, self.solid_list, False)
-        for hits in hit_list:
-            if self.x_velocity > 0:
-                self.rect.x -= 10
-            else:
-                self.rect.x += 10
-
-        # Y-Axis Movement
-        if self.y_velocity < self.y_top_speed:
-            self.y_velocity += player_grav
-        self.rect.y += self.y_velocity
-
-        hit_list = pygame.sprite.spritecollide(self, self.solid_list, False)
-        for hits in hit_list:
-            if self.y_velocity > 0:
-                self.rect.bottom = hits.rect.top
-                self.y_velocity = player_grav # Set y_velocity to player_grav so that y_velocity doesnt build up
-
-        # Move randomly
-        if not self.hit:
-            if random.randint(0, 60) == 30:
-                if random.randint(0, 1) == 1:
-                    self.x_velocity = 10
-                else:
-                    self.x_velocity = -10
-            else:
-                self.x_velocity = 0
-        # Move faster and eventually die if hit
-        elif self.hit:
-            if random.randint(0, 5) == 2:
-                if random.randint(0, 1) == 1:
-                    self.x_velocity = 20
-                else:
-                    self.x_velocity = -20
-            else:
-                self.x_velocity = 0
-
-            if random.randint(0, 120) == 30:
-                self.dead = True
-
-        # Die if off screen
-        if self.rect.y > display_height:
-            self.dead = True
-
-# Butterfly class
-class Butterfly(pygame.sprite.Sprite):
-    # Initialize the bird class
-    def __init__(self, x, y, solid_list):
-        pygame.sprite.Sprite.__init__(self)
-
-        color = random.randint(0, 2)
-        if color == 0:
-            self.list = butterfly_list_red
-        elif color == 1:
-            self.list = butterfly_list_blue
-        elif color == 2:
-            self.list = butterfly_list_green
-
-        self.image = self.list[0]
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.y = y
-
-        self.startpos_x = x
-        self.startpos_y = y
-
-        self.solid_list = solid_list
-
-        self.hit = False
-        self.dead = False
-
-        self.animation_index = 0
-        self.animation_counter = 0
-
-    def update(self):
-        # Flying animation
-        self.animation_counter = (self.animation_counter + 1) % 4
-        if self.animation_counter == 3:
-            self.animation_index = (self.animation_index + 1) % 4
-            self.image = self.list[self.animation_index-1]
-
-        # Moving randomly
-        if not self.hit:
-            if random.randint(0, 3) == 3:
-                self.rect.x += random.randint(-10, 10)
-            if random.randint(0, 3) == 3:
-                self.rect.y += random.randint(-10, 10)
-        else:
-            if random.randint(0, 2) == 2:
-                self.rect.x += random.randint(-20, 20)
-            if random.randint(0, 2) == 2:
-                self.rect.y += random.randint(-20, 20)
-
-            if random.randint(0, 120) == 20:
-                self.dead = True
-
-        # Keep the butterfly within a 100px square of its original starting position
-        if self.rect.x < self.startpos_x - 50:
-            self.rect.x += 20
-        if self.rect.x > self.startpos_x + 50:
-            self.rect.x -= 20
-        if self.rect.y < self.startpos_y - 50:
-            self.rect.y += 20
-        if self.rect.y > self.startpos_y + 50:
-            self.rect.y -= 20
-
-
 # Wall class
 class Wall(pygame.sprite.Sprite):
     # Initialize the wall class
@@ -705,8 +550,6 @@ class Wall(pygame.sprite.Sprite):
         else:
             self.image = image
 
-        self.image.convert_alpha()
-
         # If top_solid is True, the tile is only solid on the top (used for platforms)
         self.top_solid = top_solid
 
@@ -722,12 +565,12 @@ class Cloud(pygame.sprite.Sprite):
     def __init__(self, x, y):
         pygame.sprite.Sprite.__init__(self)
 
-        self.image = cloud
+        self.image = resources.cloud
         self.rect = self.image.get_rect()
         self.rect.x = x
         self.rect.y = y
 
-        self.speed = random.randrange(1, 3)
+        self.speed = rng.randrange(1, 3)
 
     # Slowly move to the left
     def update(self):
@@ -735,82 +578,3 @@ class Cloud(pygame.sprite.Sprite):
 
         if self.rect.x == 0 - self.rect.width:
             self.kill()
-
-# Fire particles
-class Fire(pygame.sprite.Sprite):
-    # Initialize the fire class
-    def __init__(self, x, y, width, height, x_velocity, y_velocity, solid_list, fade_rate = 25): # Axis determines direction (x/y)
-        pygame.sprite.Sprite.__init__(self)
-
-        self.image = pygame.Surface((width, height))
-        self.image.fill((255, 15 + random.randint(0, 200), 15))
-        self.image.convert_alpha()
-
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.bottom = y
-
-        self.x_velocity = x_velocity
-        self.y_velocity = y_velocity
-
-        self.solid_list = solid_list
-
-        self.fade_rate = fade_rate
-
-        self.alpha = 500 + random.randint(-150, 150)
-
-        self.dead = False
-
-    # Update the fire class
-    def update(self):
-        self.rect.x += self.x_velocity
-
-        # Check if the fire hit any walls during X-movement
-        hit_list = pygame.sprite.spritecollide(self, self.solid_list, False)
-        for hits in hit_list:
-            self.dead = True
-
-        self.rect.y += self.y_velocity
-
-        self.image.set_alpha(self.alpha)
-        self.alpha -= self.fade_rate
-
-        if self.alpha < 0:
-            self.dead = True
-
-# Dust particles
-class Dust(pygame.sprite.Sprite):
-    # Initialize the dust particles
-    def __init__(self, x, y, size, x_velocity, y_velocity, solid_list, fade_rate = 25):
-        pygame.sprite.Sprite.__init__(self)
-
-        self.image = pygame.Surface((size, size))
-        self.image.fill((114, 68, 70))
-        self.image.convert_alpha()
-
-        self.rect = self.image.get_rect()
-        self.rect.x = x
-        self.rect.bottom = y
-
-        self.y_velocity = y_velocity
-        self.x_velocity = x_velocity
-
-        self.fade_rate = fade_rate
-
-        self.solid_list = solid_list
-
-        self.alpha = 500 + random.randint(-150, 150)
-
-        self.dead = False
-
-    # Update the dust class
-    def update(self):
-        self.rect.x += self.x_velocity
-        self.rect.y += self.y_velocity
-        self.y_velocity += player_grav
-
-        self.image.set_alpha(self.alpha)
-        self.alpha -= self.fade_rate
-
-        if self.alpha < 0:
-            self.dead = True
@@ -0,0 +1,166 @@
+import numpy
+
+import sprites
+import tiles
+
+# Level streamer class
+# Splits a level into chunks of tile columns and only turns the chunks near the camera into sprites
+# Chunks are loaded as the camera gets near them and evicted once they are further away than the margin
+# Layers that never change don't get sprites at all, their chunks are only baked and evicted
+# Tiles that were removed from a chunk (like burnt details) stay removed when the chunk is loaded again
+class LevelStreamer:
+    # Initialize the level streamer class
+    # layers is the (layers, height, width) tile id array of the level and layer_groups has a
+    # (sprite group, chunked layer) pair for every layer, the streamer uses the chunks of the chunked layers
+    # The group of a layer that doesn't need sprites is None, its chunked layer is a render.TileArrayLayer
+    # margin is how far (in pixels) past the edges of the screen chunks are kept loaded
+    def __init__(self, layers, layer_groups, level_top, margin, chunks_per_update=1, tile_size=32):
+        self.layers = layers
+        self.layer_groups = layer_groups
+        self.level_top = level_top
+        self.margin = margin
+        self.chunks_per_update = chunks_per_update
+        self.tile_size = tile_size
+
+        self.chunk_width = layer_groups[0][1].chunk_width
+        self.chunk_columns = self.chunk_width // tile_size
+        self.chunk_count = max(1, -(-layers.shape[2] // self.chunk_columns))
+
+        # The tiles of every loaded chunk by chunk index, one list of sprites per layer
+        self.loaded = {}
+
+        # True for every chunk that is loaded, for checking many rects at once
+        self.loaded_mask = numpy.zeros(self.chunk_count, bool)
+
+        # (layer, row, column) of every tile that was removed from a chunk that isn't loaded anymore
+        self.removed = set()
+
+    # Get the range of chunk indexes between two x positions
+    def chunk_range(self, left, right):
+        first = max(0, left // self.chunk_width)
+        last = min(self.chunk_count - 1, (right - 1) // self.chunk_width)
+
+        return range(first, last + 1)
+
+    # Check if every chunk a rect overlaps is loaded
+    def is_loaded(self, rect):
+        for index in self.chunk_range(rect.left, rect.right):
+            if index not in self.loaded:
+                return False
+        return True
+
+    # Check is_loaded for many rects at once, given as arrays of their left and right sides
+    # The rects can't be wider than a chunk, so only the first and last chunk of each rect are checked
+    def are_loaded(self, left, right):
+        # A few rects are quicker to check one by one
+        if len(left) <= 16:
+            return numpy.array([self.is_span_loaded(rect_left, rect_right)
+                                for rect_left, rect_right in zip(left.tolist(), right.tolist())], bool)
+
+        first = left // self.chunk_width
+        last = (right - 1) // self.chunk_width
+
+        # A rect that doesn't overlap any chunk counts as loaded, like in is_loaded
+        outside = (last < 0) | (first >= self.chunk_count)
+
+        mask = self.loaded_mask
+        return outside | (mask[numpy.clip(first, 0, self.chunk_count - 1)] &
+                          mask[numpy.clip(last, 0, self.chunk_count - 1)])
+
+    # are_loaded for one rect
+    def is_span_loaded(self, left, right):
+        first = left // self.chunk_width
+        last = (right - 1) // self.chunk_width
+        if last < 0 or first >= self.chunk_count:
+            return True
+
+        mask = self.loaded_mask
+        return bool(mask[max(first, 0)] and mask[min(last, self.chunk_count - 1)])
+
+    # Create the tiles of a chunk, add them to their groups and bake the chunk
+    def load(self, index):
+        first = index * self.chunk_columns
+        chunk = []
+
+        for layer, (group, chunked_layer) in enumerate(self.layer_groups):
+            created = []
+
+            if group is None:
+                chunked_layer.bake(index)
+                chunk.append(created)
+                continue
+
+            level = self.layers[layer, :, first:first + self.chunk_columns]
+
+            # Only visit the cells that aren't empty
+            rows, cols = numpy.nonzero(level)
+
+            for row, col, tile_id in zip(rows.tolist(), cols.tolist(), level[rows, cols].tolist()):
+                # Look the tile up in the tile registry
+                tile = tiles.tile_registry.get(tile_id)
+                if tile is not None:
+                    column = first + col
+                    w = sprites.Wall(column * self.tile_size, self.level_top + row * self.tile_size,
+                                     self.tile_size, self.tile_size, image=tile["image"], top_solid=tile["top_solid"])
+                    w.cell = (layer, row, column)
+                    created.append(w)
+
+            # Removed tiles are created as well, but not added, so they can be put back on restore
+            alive = [w for w in created if w.cell not in self.removed]
+            group.add(*alive)
+            chunked_layer.add(alive)
+            chunked_layer.bake(index)
+
+            chunk.append(created)
+
+        self.loaded[index] = chunk
+        self.loaded_mask[index] = True
+
+    # Remove the tiles of a chunk from their groups, and remember which of them were removed
+    def evict(self, index):
+        self.loaded_mask[index] = False
+
+        for created, (group, chunked_layer) in zip(self.loaded.pop(index), self.layer_groups):
+            for w in created:
+                if w.dead or not w.alive():
+                    self.removed.add(w.cell)
+
+            if group is not None:
+                group.remove(*created)
+            chunked_layer.evict(index)
+
+    # Load and evict chunks for the part of the level on screen (view_rect)
+    # Chunks on screen are loaded right away, the other chunks within the margin and the chunks
+    # that have to be evicted are spread out over updates, at most chunks_per_update of each per update
+    def update(self, view_rect):
+        for index in self.chunk_range(view_rect.left, view_rect.right):
+            if index not in self.loaded:
+                self.load(index)
+
+        # Chunks are evicted one chunk further out than they are loaded, so a chunk right
+        # on the edge of the margin isn't loaded and evicted over and over
+        keep = self.chunk_range(view_rect.left - self.margin - self.chunk_width,
+                                view_rect.right + self.margin + self.chunk_width)
+        far = [index for index in self.loaded if index not in keep]
+        for index in far[:self.chunks_per_update]:
+            self.evict(index)
+
+        # Load the missing chunks closest to the screen first
+        wanted = self.chunk_range(view_rect.left - self.margin, view_rect.right + self.margin)
+        missing = [index for index in wanted if index not in self.loaded]
+        missing.sort(key=lambda index: abs((index + 0.5) * self.chunk_width - view_rect.centerx))
+        for index in missing[:self.chunks_per_update]:
+            self.load(index)
+
+    # Put every removed tile back, only the loaded chunks with removed tiles are baked again
+    def restore(self):
+        self.removed.clear()
+
+        for index, chunk in self.loaded.items():
+            for created, (group, chunked_layer) in zip(chunk, self.layer_groups):
+                removed = [w for w in created if w.dead or not w.alive()]
+                if removed:
+                    for w in removed:
+                        w.dead = False
+                    group.add(*removed)
+                    chunked_layer.add(removed)
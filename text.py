@@ -0,0 +1,62 @@
+import collections
+
+import pygame
+
+import settings
+import resources
+
+# Text cache class
+# Keeps rendered text surfaces keyed by font file, size, string, color and antialiasing, so text
+# that is drawn every frame is only rendered once. When it's full the least recently used text is thrown away
+class TextCache:
+    # Initialize the text cache class
+    def __init__(self, capacity=256):
+        self.capacity = capacity
+        self.surfaces = collections.OrderedDict()
+
+        # Fonts that aren't in the resources manifest, by (file, size)
+        self.fonts = {}
+
+        self.hits = 0
+        self.misses = 0
+
+    # Get the font for a file and size, fonts in the resources manifest come from resources
+    # (so they are preloaded with their group), other fonts are loaded once and kept
+    def get_font(self, size, font_file=settings.font_file):
+        for name, font in resources.fonts.items():
+            if font == (font_file, size):
+                return resources.manager.get(name)
+
+        if (font_file, size) not in self.fonts:
+            self.fonts[(font_file, size)] = pygame.font.Font(font_file, size)
+        return self.fonts[(font_file, size)]
+
+    # Get a rendered text surface, rendering it if it isn't cached
+    # The surface is shared, so it must not be drawn on
+    def render(self, msg, color, size, font_file=settings.font_file, antialias=False):
+        key = (font_file, size, msg, tuple(color), antialias)
+
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+
+        self.misses += 1
+        surface = self.get_font(size, font_file).render(msg, antialias, color)
+
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.capacity:
+            self.surfaces.popitem(last=False)
+
+        return surface
+
+    # Throw away every cached text surface
+    def clear(self):
+        self.surfaces.clear()
+
+cache = TextCache()
+
+# Get a rendered text surface from the shared text cache
+def render(msg, color, size, font_file=settings.font_file, antialias=False):
+    return cache.render(msg, color, size, font_file, antialias)
@@ -1,78 +1,86 @@
+import numpy
 import pygame
 
-from resources import *
+import resources
+
+# Tile ids are integers: the tileset id * 256 + the index of the tile in the tileset (1 - 13)
+# A tile id of 0 is an empty cell
 
 class Tileset:
-    # Initialize the tileset class
-    def __init__(self, image, id):
-        self.image = image
+    # Initialize the tileset class, image_name is the name of the tileset image in resources
+    # If top_solid is True, every tile in the tileset is only solid on the top (used for platforms)
+    # The tile images are only sliced out of the tileset image when load() is called
+    def __init__(self, image_name, id, top_solid=False):
+        self.image_name = image_name
+        self.image = None
 
         self.id = id
+        self.top_solid = top_solid
 
-        # Getting the individual tile images from the tileset
+        # The individual tiles of the tileset
         self.top = {
-                    "image": self.image.subsurface((0, 0, 32, 32)),
-                    "id": self.id + 0.01
+                    "image": None,
+                    "id": self.id * 256 + 1
                     }
 
         self.left = {
-                     "image": self.image.subsurface((32, 0, 32, 32)),
-                     "id": self.id + 0.02
+                     "image": None,
+                     "id": self.id * 256 + 2
                      }
 
         self.bottom = {
-                       "image": self.image.subsurface((64, 0, 32, 32)),
-                       "id": self.id + 0.03
+                       "image": None,
+                       "id": self.id * 256 + 3
                        }
 
         self.right = {
-                      "image": self.image.subsurface((96, 0, 32, 32)),
-                      "id": self.id + 0.04
+                      "image": None,
+                      "id": self.id * 256 + 4
                       }
 
         self.tlcorner = {
-                         "image": self.image.subsurface((0, 32, 32, 32)),
-                         "id": self.id + 0.05
+                         "image": None,
+                         "id": self.id * 256 + 5
                          }
 
         self.trcorner = {
-                         "image": self.image.subsurface((32, 32, 32, 32)),
-                         "id": self.id + 0.06
+                         "image": None,
+                         "id": self.id * 256 + 6
                          }
 
         self.blcorner = {
-                         "image": self.image.subsurface((64, 32, 32, 32)),
-                         "id": self.id + 0.07
+                         "image": None,
+                         "id": self.id * 256 + 7
                          }
 
         self.brcorner = {
-                         "image": self.image.subsurface((96, 32, 32, 32)),
-                         "id": self.id + 0.08
+                         "image": None,
+                         "id": self.id * 256 + 8
                          }
 
         self.tl_90deg = {
-                         "image": self.image.subsurface((0, 64, 32, 32)),
-                         "id": self.id + 0.09
+                         "image": None,
+                         "id": self.id * 256 + 9
                          }
 
         self.tr_90deg = {
-                         "image": self.image.subsurface((32, 64, 32, 32)),
-                         "id": self.id + 0.10
+                         "image": None,
+                         "id": self.id * 256 + 10
                          }
 
         self.bl_90deg = {
-                         "image": self.image.subsurface((64, 64, 32, 32)),
-                         "id": self.id + 0.11
+                         "image": None,
+                         "id": self.id * 256 + 11
                          }
 
         self.br_90deg = {
-                         "image": self.image.subsurface((96, 64, 32, 32)),
-                         "id": self.id + 0.12
+                         "image": None,
+                         "id": self.id * 256 + 12
                          }
 
         self.plain = {
-                      "image": self.image.subsurface((0, 96, 32, 32)),
-                      "id": self.id + 0.13
+                      "image": None,
+                      "id": self.id * 256 + 13
                       }
 
         self.all_tiles = [self.top, self.left, self.bottom, self.right,
@@ -80,10 +88,47 @@ class Tileset:
                           self.tl_90deg, self.tr_90deg, self.bl_90deg, self.br_90deg,
                           self.plain]
 
-tileset_grass = Tileset(tileset_grass, 1)
-tileset_details = Tileset(tileset_details, 2)
-tileset_oak_trees = Tileset(tileset_oak_trees, 3)
-tileset_house_1 = Tileset(tileset_house_1, 4)
-tileset_platforms = Tileset(tileset_platforms, 5)
+        for tile in self.all_tiles:
+            tile["top_solid"] = self.top_solid
+
+    # Slice the tiles out of the tileset image
+    # The tile dicts are updated in place, so the tile registry sees the new images too
+    def load(self):
+        self.image = getattr(resources, self.image_name)
+
+        for index, tile in enumerate(self.all_tiles):
+            tile["image"] = self.image.subsurface(((index % 4) * 32, (index // 4) * 32, 32, 32))
+
+tileset_grass = Tileset("tileset_grass", 1)
+tileset_details = Tileset("tileset_details", 2)
+tileset_oak_trees = Tileset("tileset_oak_trees", 3)
+tileset_house_1 = Tileset("tileset_house_1", 4)
+tileset_platforms = Tileset("tileset_platforms", 5, top_solid=True)
 
 tileset_list = [tileset_grass, tileset_details, tileset_oak_trees, tileset_house_1, tileset_platforms]
+
+# Tile registry, maps every tile id straight to its tile (image and flags)
+# so levels can be built without searching through every tileset
+tile_registry = {}
+for tileset in tileset_list:
+    for tile in tileset.all_tiles:
+        tile_registry[tile["id"]] = tile
+
+# Slice the tile images out of every tileset, this loads the tileset images if needed
+# Call it again after the tileset images have been converted
+def load_tilesets():
+    for tileset in tileset_list:
+        tileset.load()
+
+# Convert an old float tile id (tileset id + tile index / 100, like 3.1 for the tenth tile
+# of tileset 3) to an integer tile id. Integer ids are returned as they are
+def convert_tile_id(value):
+    if isinstance(value, float):
+        tileset_id = int(value)
+        return tileset_id * 256 + int(round((value - tileset_id) * 100))
+
+    return int(value)
+
+# Convert a level list (using float or integer tile ids) to a uint16 array of integer tile ids
+def convert_level(level):
+    return numpy.array([[convert_tile_id(cols) for cols in rows] for rows in level], numpy.uint16)